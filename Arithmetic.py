@@ -1,3 +1,20 @@
+import operator
+from collections import namedtuple
+from functools import lru_cache
+
+# operator precedence, = is end of operand.
+RANK = {'=': 0, '+': 1, '-': 1, '*': 2, '/': 2}
+OPERATION = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.floordiv}
+
+# result of expression.
+Value = namedtuple('Value', ['value', 'plus', 'minus', 'error', 'external', 'undefined'])
+
+# mask of object code, index is byte length.
+MASK = tuple((1 << 8 * size) - 1 for size in range(7))
+# format 3 and 4 layout, index is e bit: (byte length, opcode|n|i shift, x|b|p|e shift, address mask)
+LAYOUT = ((3, 16, 12, 0xFFF), (4, 24, 20, 0xFFFFF))
+
+
 def output_hex(n, w):
     """
     convert Decimal integer into Hexadecimal integer and fill zero to assign width
@@ -14,45 +31,67 @@ def output_hex(n, w):
         return hex(pow(16, w) + n)[2:].upper()
 
 
-def xc_to_ascii(s):
+def xc_to_bytes(s):
     """
-    convert string into ACSII code.
-    ex: C'EOF' return 454F46, X'05' return 05
+    convert string into object code.
+    ex: C'EOF' return b'EOF', X'05' return b'\\x05'
     :param s: string X'OOO' or C'OOO'
-    :return: ASCII code(hexadecimal)
+    :return: bytes, b'' for invalid pattern.
     """
-    if s[:2] == 'C\'' and s[-1] == '\'':
-        # C'OOO' correct char pattern.
-        temp = ''
-        for char in s[2:-1]:
-            # convert char into ASCII.
-            temp += output_hex(ord(char), 2)
-        return temp
-    elif s[:2] == 'X\'' and s[-1] == '\'':
-        # X'OOO' correct byte pattern.
-        return s[2:-1]
-    else:
-        # invalid pattern.
-        return ''
+    try:
+        if s[:2] == 'C\'' and s[-1] == '\'':
+            # C'OOO' correct char pattern, a char is a byte.
+            return bytes(map(ord, s[2:-1]))
+        elif s[:2] == 'X\'' and s[-1] == '\'':
+            # X'OOO' correct byte pattern, 2 columns hexadecimal is a byte.
+            return bytes.fromhex(s[2:-1])
+    except ValueError:
+        # char over a byte or odd hexadecimal columns.
+        pass
+    return b''
 
 
-def expression(modify, symbol_tab, extref, s, length=0):
+def encode(n, size):
     """
-    compute operand value use postfix.
-    :param modify: modify list
-    :param symbol_tab: dict
-    :param extref: external reference list
+    integer as big endian object code, negative integer is two's complement.
+    ex: n=-3 size=3 return b'\\xff\\xff\\xfd'
+    :param n: integer
+    :param size: byte length
+    :return: bytes
+    """
+    return (n & MASK[size]).to_bytes(size, 'big')
+
+
+def instruction(opcode, flags, address, e):
+    """
+    object code of format 3 or format 4 instruction.
+    format 3: opcode|n|i(8 bits) x|b|p|e(4 bits) displacement(12 bits)
+    format 4: opcode|n|i(8 bits) x|b|p|e(4 bits) address(20 bits)
+    :param opcode: opcode + n * 2 + i
+    :param flags: x * 8 + b * 4 + p * 2 + e
+    :param address: displacement or address, negative displacement is two's complement.
+    :param e: 0 for format 3, 1 for format 4.
+    :return: bytes
+    """
+    size, opcode_shift, flags_shift, mask = LAYOUT[e]
+    return (opcode << opcode_shift | flags << flags_shift | address & mask).to_bytes(size, 'big')
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(s):
+    """
+    compile operand into postfix once, the same operand string reuse compiled result.
+    ex: 'BUFEND-BUFFER' -> terms: (('0', True, 0), ('BUFEND', True, None), ('BUFFER', False, None))
+                           postfix: (0, 1, '+', 2, '-')
     :param s: operand
-    :param length: start address to current code length.
-    :return: [loc, positive symbol quantity, negative symbol quantity, is error expression]
+    :return: (terms, postfix), term structure: (name, is positive, integer value or None),
+             postfix item is term slot(int) or operator(string).
     """
-    stack = []
+    terms = []
     postfix = []
-    plus = 0
-    minus = 0
-    error = False
+    stack = []
 
-    if s[0] == '-' or s[0] == '+':
+    if s[:1] == '-' or s[:1] == '+':
         """
         +OOO-XXX -> 0+OOO-XXX=, -OOO+XXX -> 0-OOO+XXX=
         add 0 in start for detect how many positive and negative quantity easily.
@@ -65,60 +104,85 @@ def expression(modify, symbol_tab, extref, s, length=0):
 
     temp = ''
     add = True
-    rank = {'=': 0, '+': 1, '-': 1, '*': 2, '/': 2}
-    for j in range(len(s)):
-        if s[j] == '+' or s[j] == '-' or s[j] == '*' or s[j] == '/' or s[j] == '=':
-            if temp in symbol_tab:
-                if add:
-                    plus += 1
-                else:
-                    minus += 1
-                postfix.append(symbol_tab[temp][0])
-            elif temp in extref:
-                if add:
-                    plus += 1
-                else:
-                    minus += 1
-                sign = '+' if add else '-'
-                modify.append('M' + output_hex(length, 6) + output_hex(6, 2) + sign + temp)
-                postfix.append(0)
-            else:
-                try:
-                    postfix.append(int(temp))
-                except ValueError:
-                    print(temp + ' is undefined symbol.')
-                    postfix.append(0)
-                    error = True
-
-            add = (s[j] != '-')
+    for char in s:
+        if char in RANK:
+            try:
+                value = int(temp)
+            except ValueError:
+                value = None
+            # term slot, value is resolved when evaluate.
+            postfix.append(len(terms))
+            terms.append((temp, add, value))
+
+            add = (char != '-')
             temp = ''
-            while len(stack) > 0 and rank[stack[-1]] >= rank[s[j]]:
+            while len(stack) > 0 and RANK[stack[-1]] >= RANK[char]:
                 postfix.append(stack.pop())
-            stack.append(s[j])
+            stack.append(char)
         else:
-            temp += s[j]
+            temp += char
+
+    # int slot and operator are immutable, safe to share by cache.
+    return tuple(terms), tuple(postfix)
+
 
-    stack.pop()
+def expression(symbol_tab, extref, s):
+    """
+    compute operand value use compiled postfix.
+    :param symbol_tab: Symtab.SymbolTable, or {symbol: [address, block]} of one pass assembler.
+    :param extref: external reference list
+    :param s: operand
+    :return: Value(value, positive symbol quantity, negative symbol quantity, is error expression,
+             external reference [(sign, symbol)], undefined symbol [symbol]), caller reports undefined symbols.
+    """
+    terms, postfix = compile_expression(s)
+    values = []
+    external = []
+    undefined = []
+    plus = 0
+    minus = 0
+    error = False
 
+    for name, add, value in terms:
+        if name in symbol_tab:
+            if add:
+                plus += 1
+            else:
+                minus += 1
+            values.append(symbol_tab[name][0])
+        elif name in extref:
+            if add:
+                plus += 1
+            else:
+                minus += 1
+            external.append(('+' if add else '-', name))
+            values.append(0)
+        elif value is not None:
+            values.append(value)
+        else:
+            undefined.append(name)
+            values.append(0)
+            error = True
+
+    stack = []
     for a in postfix:
-        if a == '+':
-            o2 = stack.pop()
-            o1 = stack.pop()
-            stack.append(o1 + o2)
-        elif a == '-':
-            o2 = stack.pop()
-            o1 = stack.pop()
-            stack.append(o1 - o2)
-        elif a == '*':
-            o2 = stack.pop()
-            o1 = stack.pop()
-            stack.append(o1 * o2)
-        elif a == '/':
+        if a.__class__ is int:
+            stack.append(values[a])
+        else:
             o2 = stack.pop()
             o1 = stack.pop()
-            stack.append(o1 / o2)
-        else:
-            stack.append(a)
+            stack.append(OPERATION[a](o1, o2))
+
+    # int, int, int, boolean, list, list
+    return Value(stack.pop(), plus, minus, error, external, undefined)
+
 
-    # int, int, int, boolean
-    return stack.pop(), plus, minus, error
+def modification(external, length):
+    """
+    generate modify records of external reference in expression, whole word(6 half bytes) is modified.
+    ex: external=[('+', 'BUFEND'), ('-', 'BUFFER')], length=0x28 -> [(0x28, 6, '+', 'BUFEND'), (0x28, 6, '-', 'BUFFER')]
+    :param external: [(sign, symbol)] from expression.
+    :param length: start address to current code length.
+    :return: list of modify record(address, length(half byte), sign, symbol).
+    """
+    return [(length, 6, sign, name) for sign, name in external]
@@ -0,0 +1,140 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from SICXE import SicXE
+from SIC import Sic
+import Generator
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+# timed phases, load_code only opens the row stream, rows are read while pass1 fetches them.
+PHASES = ['load_code', 'pass1', 'pass2', 'object_code', 'figure']
+
+# golden figures: (figure, machine)
+FIGURES = [('2.1', 'SIC'), ('2.5', 'SICXE'), ('2.9', 'SICXE'), ('2.11', 'SICXE'), ('2.15', 'SICXE')]
+
+
+def timed(assembler, times):
+    """
+    wrap phase methods of an assembler instance, run() calls them through the instance so it is not changed.
+    time of a phase called many times(pass1 of every control section) is summed.
+    :param assembler: Sic or SicXE.
+    :param times: {phase: seconds} to accumulate into.
+    :return: assembler.
+    """
+    for phase in PHASES:
+        # load_code is a protected method of Core.
+        attribute = '_' + phase if phase == 'load_code' else phase
+        setattr(assembler, attribute, _timer(getattr(assembler, attribute), phase, times))
+    return assembler
+
+
+def _timer(method, phase, times):
+    def call(*args, **kwargs):
+        begin = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            times[phase] = times.get(phase, 0) + time.perf_counter() - begin
+    return call
+
+
+def measure(code_file, op_file, machine, out_dir, memory=True):
+    """
+    assemble a file and time every phase.
+    :param code_file: assembly code file(.txt).
+    :param op_file: operator file(.csv).
+    :param machine: 'SIC' or 'SICXE'.
+    :param out_dir: directory of object code file and figure file.
+    :param memory: whether assemble again under tracemalloc for peak memory.
+    :return: ({phase: seconds}, total seconds, peak memory(byte) or None, object code file, figure file)
+    """
+    ob_file = os.path.join(out_dir, os.path.basename(code_file) + '.obj')
+    figure_file = os.path.join(out_dir, os.path.basename(code_file) + '.lst')
+    times = {}
+
+    begin = time.perf_counter()
+    _assemble(code_file, op_file, machine, ob_file, figure_file, times)
+    total = time.perf_counter() - begin
+
+    peak = None
+    if memory:
+        # traced run is slower, so it is not timed.
+        tracemalloc.start()
+        try:
+            _assemble(code_file, op_file, machine, ob_file, figure_file, {})
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return times, total, peak, ob_file, figure_file
+
+
+def _assemble(code_file, op_file, machine, ob_file, figure_file, times):
+    assembler = timed(Sic() if machine == 'SIC' else SicXE(), times)
+    assembler.run(code_file, op_file, ob_file)
+    assembler.figure(figure_file)
+
+
+def golden(op_file, out_dir):
+    """
+    assemble textbook figures and compare with object_code/ and obfigure/.
+    :param op_file: operator file(.csv).
+    :param out_dir: directory of output files.
+    :return: [mismatch file]
+    """
+    mismatch = []
+    for figure, machine in FIGURES:
+        code_file = os.path.join(path, 'assembly', 'Figure' + figure + '.txt')
+        _, _, _, ob_file, figure_file = measure(code_file, op_file, machine, out_dir, memory=False)
+        for out, expect in [(ob_file, os.path.join(path, 'object_code', 'object_code' + figure + '.txt')),
+                            (figure_file, os.path.join(path, 'obfigure', 'obfigure' + figure + '.txt'))]:
+            with open(out, 'r') as a, open(expect, 'r') as b:
+                if a.read() != b.read():
+                    mismatch.append(expect)
+    return mismatch
+
+
+def main(argv=None):
+    """
+    command line benchmark.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description='benchmark assembler on generated assembly code.')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='row quantities')
+    parser.add_argument('-o', '--optab', default=os.path.join(path, 'opcode.csv'), help='operator file(.csv)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='do not measure peak memory')
+    parser.add_argument('--keep', help='keep generated and output files in directory')
+    Generator.add_arguments(parser)
+    args = parser.parse_args(argv)
+    options = {option: getattr(args, option) for option in Generator.OPTIONS}
+
+    out_dir = args.keep if args.keep is not None else tempfile.mkdtemp()
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        mismatch = golden(args.optab, out_dir)
+        print('golden: ' + ('OK' if len(mismatch) == 0 else 'MISMATCH ' + ' '.join(mismatch)))
+
+        print('rows'.rjust(9) + ''.join(phase.rjust(12) for phase in PHASES) + 'total'.rjust(10) +
+              'rows/s'.rjust(11) + 'peak(MB)'.rjust(10))
+        for size in args.sizes:
+            code_file = os.path.join(out_dir, 'generated' + str(size) + '.txt')
+            rows = Generator.write(code_file, lines=size, **options)
+            times, total, peak, _, _ = measure(code_file, args.optab, args.machine, out_dir, args.memory)
+            print(str(rows).rjust(9) + ''.join(format(times.get(phase, 0), '.4f').rjust(12) for phase in PHASES) +
+                  format(total, '.3f').rjust(10) + format(rows / total, '.0f').rjust(11) +
+                  (format(peak / (1 << 20), '.1f') if peak is not None else '-').rjust(10))
+    finally:
+        if args.keep is None:
+            shutil.rmtree(out_dir)
+
+    return 1 if len(mismatch) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
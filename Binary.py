@@ -0,0 +1,254 @@
+import argparse
+import mmap
+import struct
+import sys
+import Record
+
+# binary object file:
+# file header:    magic(4) 'SICB' | version(1) | dialect(1) 0: SIC, 1: SIC/XE | reserved(2)
+# section:        size(4) of following bytes
+#                 start(4) | length(4) | entry(4) -1 for no address | D count(2) | R count(2) | T count(4) | M count(4)
+#                 | flags(1) 1: relocation bits
+#                 name: length(1) | ascii
+#                 D:  (length(1) | symbol | address(4)) * D count
+#                 R:  (length(1) | symbol) * R count
+#                 T:  (address(4) | length(2) | item count(1) | [mask(4)] | item length(1) * item count | raw bytes)
+#                     * T count, mask is relocation bit mask, only when section has relocation bits flag.
+#                 M:  (address(4) | length(1) half byte | sign(1) '+', '-' or 0 | length(1) | symbol) * M count
+# integers are big endian, every object code keeps its own length so the text format can be restored losslessly.
+
+MAGIC = b'SICB'
+VERSION = 2
+DIALECT = {Record.SIC: 0, Record.SICXE: 1}
+# section flags.
+MASKS = 1
+
+FILE_HEADER = struct.Struct('>4sBBH')
+SIZE = struct.Struct('>I')
+SECTION_HEADER = struct.Struct('>IIiHHIIB')
+ADDRESS = struct.Struct('>I')
+TEXT = struct.Struct('>IHB')
+MODIFY = struct.Struct('>IBcB')
+MASK = struct.Struct('>I')
+
+
+def _string(s):
+    """
+    length prefixed ascii string.
+    :param s: string.
+    :return: bytes.
+    """
+    s = s.encode('ascii')
+    return bytes([len(s)]) + s
+
+
+def encode(section):
+    """
+    object program of a control section as binary, with size prefix.
+    :param section: Record.Section.
+    :return: bytes.
+    """
+    masks = section.masks is not None
+    out = [SECTION_HEADER.pack(section.start, section.length, -1 if section.entry is None else section.entry,
+                               len(section.extdef), len(section.extref), len(section.text), len(section.modify),
+                               MASKS if masks else 0),
+           _string(section.name)]
+
+    for symbol, address in section.extdef:
+        out.append(_string(symbol) + ADDRESS.pack(address))
+
+    for symbol in section.extref:
+        out.append(_string(symbol))
+
+    for j, (address, length, codes) in enumerate(section.text):
+        out.append(TEXT.pack(address, length, len(codes)))
+        if masks:
+            out.append(MASK.pack(section.masks[j]))
+        out.append(bytes(len(ob_code) for ob_code in codes))
+        out.extend(codes)
+
+    for address, length, sign, symbol in section.modify:
+        out.append(MODIFY.pack(address, length, sign.encode('ascii') or b'\0', len(symbol)) + symbol.encode('ascii'))
+
+    body = b''.join(out)
+    return SIZE.pack(len(body)) + body
+
+
+def dumps(sections, dialect=Record.SICXE):
+    """
+    object programs as binary object file content.
+    :param sections: [Record.Section]
+    :param dialect: Record.SIC or Record.SICXE.
+    :return: bytes.
+    """
+    return FILE_HEADER.pack(MAGIC, VERSION, DIALECT[dialect], 0) + b''.join(encode(section) for section in sections)
+
+
+def loads(buffer):
+    """
+    parse binary object file without copy, T record object code are memoryview into buffer.
+    :param buffer: bytes, bytearray or mmap.
+    :return: (dialect, [Record.Section])
+    """
+    view = memoryview(buffer)
+    magic, version, dialect, _ = FILE_HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a binary object file.')
+
+    offset = FILE_HEADER.size
+    sections = []
+    while offset < len(view):
+        size, = SIZE.unpack_from(view, offset)
+        offset += SIZE.size
+        sections.append(_decode(view, offset))
+        offset += size
+
+    return (Record.SIC if dialect == DIALECT[Record.SIC] else Record.SICXE), sections
+
+
+def _decode(view, offset):
+    """
+    parse object program of a control section.
+    :param view: memoryview of binary object file.
+    :param offset: section start offset(after size).
+    :return: Record.Section.
+    """
+    start, length, entry, n_def, n_ref, n_text, n_modify, flags = SECTION_HEADER.unpack_from(view, offset)
+    offset += SECTION_HEADER.size
+    name, offset = _read_string(view, offset)
+    masks = flags & MASKS != 0
+    section = Record.Section(name, start, length, entry=None if entry < 0 else entry, masks=[] if masks else None)
+
+    for _ in range(n_def):
+        symbol, offset = _read_string(view, offset)
+        address, = ADDRESS.unpack_from(view, offset)
+        offset += ADDRESS.size
+        section.extdef.append((symbol, address))
+
+    for _ in range(n_ref):
+        symbol, offset = _read_string(view, offset)
+        section.extref.append(symbol)
+
+    for _ in range(n_text):
+        address, row_length, count = TEXT.unpack_from(view, offset)
+        offset += TEXT.size
+        if masks:
+            section.masks.append(MASK.unpack_from(view, offset)[0])
+            offset += MASK.size
+        sizes = view[offset:offset + count]
+        offset += count
+        codes = []
+        for size in sizes:
+            codes.append(view[offset:offset + size])
+            offset += size
+        section.text.append([address, row_length, codes])
+
+    for _ in range(n_modify):
+        address, half, sign, symbol_length = MODIFY.unpack_from(view, offset)
+        offset += MODIFY.size
+        symbol = bytes(view[offset:offset + symbol_length]).decode('ascii')
+        offset += symbol_length
+        section.modify.append((address, half, '' if sign == b'\0' else sign.decode('ascii'), symbol))
+
+    return section
+
+
+def _read_string(view, offset):
+    """
+    :param view: memoryview.
+    :param offset: offset of length prefixed string.
+    :return: string, next offset.
+    """
+    length = view[offset]
+    return bytes(view[offset + 1:offset + 1 + length]).decode('ascii'), offset + 1 + length
+
+
+def load(file_name):
+    """
+    map binary object file into memory and parse it without copy.
+    :param file_name: binary object file.
+    :return: (dialect, [Record.Section])
+    """
+    with open(file_name, 'rb') as file:
+        # mapping stays alive while T record memoryview refer to it.
+        content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(content)
+
+
+def text_to_binary(text_file, binary_file):
+    """
+    convert text object file into binary object file.
+    :param text_file: object code file(.txt).
+    :param binary_file: binary object file.
+    """
+    with open(text_file, 'r') as file:
+        dialect, sections = Record.parse(file.read())
+    with open(binary_file, 'wb') as file:
+        file.write(dumps(sections, dialect))
+
+
+def binary_to_text(binary_file, text_file):
+    """
+    convert binary object file into text object file.
+    :param binary_file: binary object file.
+    :param text_file: object code file(.txt).
+    """
+    with open(binary_file, 'rb') as file:
+        dialect, sections = loads(file.read())
+    with Record.ObjectWriter(text_file, dialect) as writer:
+        for section in sections:
+            writer.write(section)
+
+
+class BinaryWriter(Record.Writer):
+    """
+    write object programs into binary object file, same interface as Record.ObjectWriter.
+    """
+    def __init__(self, file, dialect=Record.SICXE):
+        """
+        :param file: binary object file name, or any binary file-like object which has write.
+        :param dialect: Record.SIC or Record.SICXE.
+        """
+        super().__init__(file, 'wb')
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, DIALECT[dialect], 0))
+
+    def write(self, section):
+        """
+        write object program of a control section.
+        :param section: Record.Section.
+        """
+        self._file.write(encode(section))
+
+
+def writer(file, dialect=Record.SICXE, binary=False):
+    """
+    object file writer, relocation bit masks are marked per section.
+    :param file: object file name or file-like object.
+    :param dialect: Record.SIC or Record.SICXE.
+    :param binary: whether write binary object file.
+    :return: Record.ObjectWriter or BinaryWriter.
+    """
+    return BinaryWriter(file, dialect) if binary else Record.ObjectWriter(file, dialect)
+
+
+def main(argv=None):
+    """
+    command line converter between text and binary object file.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description='convert object file between text and binary format.')
+    parser.add_argument('direction', choices=['to-binary', 'to-text'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args(argv)
+
+    if args.direction == 'to-binary':
+        text_to_binary(args.source, args.target)
+    else:
+        binary_to_text(args.source, args.target)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
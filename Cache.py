@@ -0,0 +1,180 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+# assembler version, change it when object code or figure output changes so old results are not reused.
+VERSION = '10'
+
+
+def digest(*parts):
+    """
+    hash of key parts.
+    :param parts: strings or bytes.
+    :return: sha256 hexadecimal string.
+    """
+    sha = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        # length prefix keeps ('ab', 'c') and ('a', 'bc') apart.
+        sha.update(str(len(part)).encode() + b':' + part)
+    return sha.hexdigest()
+
+
+def file_digest(file_name):
+    """
+    hash of file content.
+    :param file_name: file.
+    :return: sha256 hexadecimal string.
+    """
+    sha = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class FileCache(object):
+    """
+    per-process cache of values loaded from files, shared by every assembler and thread.
+    value is loaded again only when file state(modification time, size) changes.
+    """
+    def __init__(self, loader):
+        """
+        :param loader: function(absolute path, *arguments) -> value.
+        entries: {absolute path: (file state, value)}
+        """
+        self.__loader = loader
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def get(self, file_name, *arguments):
+        """
+        get value of file, load it if file is not loaded or changed.
+        loaded value is read without lock, only loading is serialized.
+        :param file_name: file.
+        :param arguments: extra arguments of loader.
+        :return: value.
+        """
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+        state = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self.__entries.get(path)
+        if entry is not None and entry[0] == state:
+            return entry[1]
+
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is None or entry[0] != state:
+                entry = (state, self.__loader(path, *arguments))
+                self.__entries[path] = entry
+
+        return entry[1]
+
+
+class BuildCache(object):
+    """
+    on-disk cache of assembled result, one file per key.
+    least recently used entries are evicted when total size is over max size.
+    """
+    def __init__(self, directory, max_size=64 << 20):
+        """
+        :param directory: cache directory.
+        :param max_size: max total size(byte) of cache files.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.__size = None
+
+    def get(self, key):
+        """
+        get cached value.
+        :param key: key from digest().
+        :return: value, None if key is not cached.
+        """
+        file_name = self.__path(key)
+        try:
+            with open(file_name, 'rb') as file:
+                value = pickle.load(file)
+            # mark recently used.
+            os.utime(file_name)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return value
+
+    def put(self, key, value):
+        """
+        cache value, file is replaced atomically so other process never read half written entry.
+        :param key: key from digest().
+        :param value: picklable value.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(temp)
+            os.replace(temp, self.__path(key))
+        except OSError:
+            # cache is optional.
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+
+        if self.__size is None:
+            self.__size = self.__entries()[1]
+        else:
+            self.__size += size
+
+        if self.__size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        remove least recently used entries until total size is not over max size.
+        """
+        entries, size = self.__entries()
+        # oldest first.
+        entries.sort()
+        for _, entry_size, file_name in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                # removed by other process.
+                pass
+            size -= entry_size
+        self.__size = size
+
+    def __entries(self):
+        """
+        scan cache directory.
+        :return: [(last used time, size, file name)], total size
+        """
+        entries = []
+        size = 0
+        try:
+            scan = list(os.scandir(self.directory))
+        except OSError:
+            return entries, size
+
+        for entry in scan:
+            if entry.name.endswith('.pickle'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                size += stat.st_size
+        return entries, size
+
+    def __path(self, key):
+        """
+        :param key: key from digest().
+        :return: cache file of key.
+        """
+        return os.path.join(self.directory, key + '.pickle')
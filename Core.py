@@ -0,0 +1,338 @@
+import Diagnostics as D
+import Listing
+import Macro
+import Optab
+import Profile
+import Record
+import Source
+import Symtab
+
+
+class Core(object):
+    """
+    assembler engine shared by Sic and SicXE, a machine is a configuration of it.
+    machine configuration:
+        DIALECT: object code dialect of Record.
+        XE: whether rows use SIC/XE syntax(format 4, @, #, literal, format 2, CSECT), figure has block column.
+        handler tables: directives of machine added into _pass1_tab and _pass2_tab.
+        hooks: _define, _instruction1, _instruction2 and _address.
+    pass1 and pass2 dispatch every row by one dict lookup of its operator, instruction rows go to instruction hook.
+    """
+    DIALECT = Record.SICXE
+    XE = True
+
+    def __init__(self):
+        """
+        code structure: [Line(location, block, symbol, operator, operand, program counter, object code)]
+        operator table: {operator: Operator(opcode, format)}, shared by all instances.
+        symbol table: Symtab.SymbolTable, pass1 resolves operand symbol of instruction row into id(Line.value).
+        literal pool: {row index: [Line]}, literal rows placed after code[row index].
+        source: row generator which has not been loaded into code.
+        locctr: location counter of pass1. block: current block of pass1.
+        lookups, expressions, literals: instrumentation counters of running pass, handlers count only when
+                                        profile is set, pass1 counts symbol definitions in a local integer.
+        profile: Profile.Profile of this run, None when instrumentation is disabled.
+        diagnostics: Diagnostics.Diagnostics which collects errors.
+        includes: {absolute path: content digest} of include files read while rows are loaded.
+        handler tables: {operator: handler(row index, Line)}, row without handler is invalid in pass1 and
+                        has nothing to do in pass2.
+        """
+        self._code = []
+        self._source = iter(())
+        self._operator_tab = {}
+        self._symbol_tab = Symtab.SymbolTable()
+        self._literal_pool = {}
+        self._start_address = 0
+        self._length = 0
+        self._locctr = 0
+        self._block = 0
+        self._lookups = 0
+        self._expressions = 0
+        self._literals = 0
+        self._profile = None
+        self._diagnostics = D.Diagnostics()
+        self.includes = {}
+        self._pass1_tab = {'WORD': self.__word, 'RESW': self.__resw, 'RESB': self.__resb, 'BYTE': self.__byte1}
+        self._pass2_tab = {'BYTE': self.__byte2}
+
+    def _load_code(self, file_name, use_mmap=False, libraries=(), include_path=()):
+        """
+        open assembly code as source, rows are loaded into code lazily while pass1 reads them.
+        macros are expanded and include files are inserted while rows are loaded.
+        :param file_name: assembly code file(.txt).
+        :param use_mmap: whether read file through mmap.
+        :param libraries: macro library files(.txt).
+        :param include_path: include directories.
+        """
+        processor = Macro.MacroProcessor(libraries, self._diagnostics, include_path)
+        # filled while rows are loaded.
+        self.includes = processor.included
+        self._source = processor.expand(Source.read_code(file_name, use_mmap), file_name)
+
+    def _fetch(self, index):
+        """
+        get a row of code, load rows from source until index is loaded.
+        source without END row is reported and ends with an END row, so passes stop there.
+        :param index: row index.
+        :return: Line.
+        """
+        while index >= len(self._code):
+            line = next(self._source, None)
+            if line is None:
+                self._diagnostics.error(None, D.MISSING_END, 'END')
+                line = Source.Line('', 'END')
+            self._code.append(line)
+        return self._code[index]
+
+    def _load_optab(self, file_name):
+        """
+        load operator table, it is parsed once per process.
+        :param file_name: operator table file(.csv).
+        """
+        self._operator_tab = Optab.load(file_name)
+
+    def _pass1_rows(self, index):
+        """
+        lex, define symbol and run pass1 handler of every row from index until END or CSECT row.
+        :param index: first row index.
+        :return: index of END or CSECT row.
+        """
+        fetch = self._fetch
+        operator_tab = self._operator_tab
+        table = self._pass1_tab
+        invalid = self.__invalid
+        define = self._define
+        instruction = self._instruction1
+        lex = Source.lex
+        xe = self.XE
+        # symbol table lookup of every defined row.
+        lookups = 0
+        while True:
+            line = fetch(index)
+            operator = line.operator
+            if operator == 'END':
+                break
+            elif line.symbol == '.':
+                # . is annotation.
+                pass
+            elif xe and operator == 'CSECT':
+                # control section end.
+                break
+            elif line.symbol == '' and operator == '' and line.operand == '':
+                # blank line.
+                pass
+            else:
+                # operator and operand are parsed here once, pass2 reads typed fields.
+                lex(line, operator_tab, xe)
+                define(index, line)
+                lookups += 1
+                if line.entry is not None:
+                    instruction(index, line)
+                else:
+                    table.get(operator, invalid)(index, line)
+                # program counter.
+                line.pc = self._locctr
+            index += 1
+
+        if self._profile is not None:
+            self._lookups += lookups
+        return index
+
+    def _pass2_rows(self, index):
+        """
+        run pass2 handler of every row from index until END or CSECT row.
+        :param index: first row index.
+        """
+        code = self._code
+        table = self._pass2_tab
+        instruction = self._instruction2
+        xe = self.XE
+        while True:
+            line = code[index]
+            operator = line.operator
+            if operator == 'END':
+                return
+            elif line.symbol == '.':
+                # . is annotation.
+                pass
+            elif xe and operator == 'CSECT':
+                # control section end.
+                return
+            elif line.entry is not None:
+                instruction(index, line)
+            elif operator in table:
+                table[operator](index, line)
+            index += 1
+
+    def _define(self, index, line):
+        """
+        define symbol of a row, hook of machine.
+        :param index: row index.
+        :param line: Line.
+        """
+        raise NotImplementedError
+
+    def _instruction1(self, index, line):
+        """
+        pass1 of instruction row, hook of machine.
+        :param index: row index.
+        :param line: Line.
+        """
+        raise NotImplementedError
+
+    def _instruction2(self, index, line):
+        """
+        pass2 of instruction row, hook of machine.
+        :param index: row index.
+        :param line: Line.
+        """
+        raise NotImplementedError
+
+    def _address(self, line):
+        """
+        object code address of a row, hook of machine.
+        :param line: Line.
+        :return: address.
+        """
+        return line.loc
+
+    def _advance(self, line, size):
+        """
+        put row at location counter and move location counter over it.
+        :param line: Line.
+        :param size: bytes of row.
+        """
+        line.loc = self._locctr
+        line.block = self._block
+        self._locctr += size
+        self._length += size
+
+    def __word(self, index, line):
+        self._advance(line, 3)
+
+    def __resw(self, index, line):
+        self._advance(line, int(line.operand) * 3)
+
+    def __resb(self, index, line):
+        self._advance(line, int(line.operand))
+
+    def __byte1(self, index, line):
+        self._advance(line, len(line.data))
+
+    def __byte2(self, index, line):
+        # object code: operand perform ascii code. ex: BYTE C'EOF' -> 454f46
+        line.object_code = line.data
+
+    def __invalid(self, index, line):
+        self._diagnostics.error(index, D.INVALID_OPERATOR, line.operator)
+
+    def _count(self):
+        """
+        add instrumentation counters of finished pass into profile and reset them.
+        """
+        if self._profile is not None:
+            self._profile.count('symbol_lookups', self._lookups)
+            self._profile.count('expressions', self._expressions)
+            self._profile.count('literals', self._literals)
+        self._lookups = 0
+        self._expressions = 0
+        self._literals = 0
+
+    def _text_items(self, start, end):
+        """
+        object code of rows with whether it starts a new T record.
+        T record: a new row starts when block changes, RESW or RESB interrupts continuous address,
+        or row is over 30 bytes.
+        :param start: start index.
+        :param end: end index(exclusive).
+        :return: generator of (address, object code, whether start new row).
+        """
+        first = True
+        block = None
+        for line in self._lines(start, end):
+            if line.operator == 'RESW' or line.operator == 'RESB':
+                # RESW and RESB interrupt continuous address.
+                first = True
+
+            if line.object_code != b'':
+                # has object code.
+                yield self._address(line), line.object_code, first or line.block != block
+                first = False
+                block = line.block
+
+    def _coalesced_items(self, start, end):
+        """
+        object code of rows in final address order, a new T record starts only where address is not continuous.
+        rows of every block are placed by block table, so interleaved blocks become contiguous ranges and
+        each range is packed into maximal T records. rows at the same address keep source order, ex: ORG.
+        :param start: start index.
+        :param end: end index(exclusive).
+        :return: list of (address, object code, whether start new row).
+        """
+        address = self._address
+        codes = sorted([(address(line), line.object_code) for line in self._lines(start, end)
+                        if line.object_code != b''], key=lambda item: item[0])
+        items = []
+        last = None
+        for loc, ob_code in codes:
+            items.append((loc, ob_code, loc != last))
+            last = loc + len(ob_code)
+        return items
+
+    def _lines(self, start, end):
+        """
+        rows of code with literal pools spliced after the row which owns them.
+        :param start: start index.
+        :param end: end index(exclusive).
+        :return: generator of Line.
+        """
+        for index in range(start, end):
+            yield self._code[index]
+            if index in self._literal_pool:
+                yield from self._literal_pool[index]
+
+    def row(self, index):
+        """
+        a row of code.
+        :param index: row index.
+        :return: string (location block symbol operator operand object code), SIC has no block.
+        """
+        return Listing.render(self._code[index], self.XE)
+
+    def rows(self, start, end):
+        """
+        rows of a range of code with their literal pools, rendered lazily, ex: context of an error report.
+        :param start: start index.
+        :param end: end index(exclusive).
+        :return: generator of string.
+        """
+        xe = self.XE
+        for line in self._lines(max(start, 0), min(end, len(self._code))):
+            yield Listing.render(line, xe)
+
+    def figure(self, figure_file):
+        """
+        assembly code write figure.
+        :param figure_file: figure name to write(.txt) or file-like object.
+        """
+        with Profile.phase(self._profile, 'figure'), Listing.ListingWriter(figure_file, self.XE) as writer:
+            writer.write(self._lines(0, len(self._code)))
+
+    def _listing(self, figure_file):
+        """
+        figure writer which renders rows on a background thread while object code is written.
+        :param figure_file: figure name to write(.txt) or file-like object, None for no figure.
+        :return: Listing.ListingWriter or None.
+        """
+        if figure_file is None:
+            return None
+        return Listing.ListingWriter(figure_file, self.XE, background=True)
+
+    def _close_listing(self, listing):
+        """
+        wait for figure writer.
+        :param listing: Listing.ListingWriter or None.
+        """
+        if listing is not None:
+            with Profile.phase(self._profile, 'figure'):
+                listing.close()
@@ -0,0 +1,125 @@
+import sys
+from collections import namedtuple
+
+# error codes.
+DUPLICATE_SYMBOL = 'duplicate_symbol'
+UNDEFINED_SYMBOL = 'undefined_symbol'
+INVALID_OPERATOR = 'invalid_operator'
+INVALID_OPERAND = 'invalid_operand'
+INVALID_REGISTER = 'invalid_register'
+INVALID_IMMEDIATE = 'invalid_immediate'
+ERROR_EXPRESSION = 'error_expression'
+FORWARD_REFERENCE = 'forward_reference'
+FORMAT_THREE = 'format_three'
+UNSUPPORTED = 'unsupported'
+MACRO_DEFINITION = 'macro_definition'
+MACRO_ARGUMENT = 'macro_argument'
+MACRO_EXPRESSION = 'macro_expression'
+MACRO_RECURSION = 'macro_recursion'
+INVALID_INCLUDE = 'invalid_include'
+MISSING_END = 'missing_end'
+
+# message after row, {} is token.
+MESSAGE = {
+    DUPLICATE_SYMBOL: '   {} is duplicate symbol.',
+    UNDEFINED_SYMBOL: '   {} is undefined symbol.',
+    INVALID_OPERATOR: '   {} is invalid operation code.',
+    INVALID_OPERAND: '   {} is invalid operand.',
+    INVALID_REGISTER: '   {} is invalid register.',
+    INVALID_IMMEDIATE: '   #{} is error operand.',
+    ERROR_EXPRESSION: '   {} is error expression.',
+    FORWARD_REFERENCE: '   {} is forward reference in expression.',
+    FORMAT_THREE: ' can not use format three.',
+    UNSUPPORTED: '   {} is not supported in one pass mode.',
+    MACRO_DEFINITION: '   {} is invalid macro definition.',
+    MACRO_ARGUMENT: '   {} is extra macro argument.',
+    MACRO_EXPRESSION: '   {} is invalid macro condition.',
+    MACRO_RECURSION: '   {} is nested too deep.',
+    INVALID_INCLUDE: '   {} is not found include file.',
+    MISSING_END: '   {} is missing.',
+}
+
+# an error: row index(None for no row), error code, token which caused it.
+Diagnostic = namedtuple('Diagnostic', ['index', 'code', 'token'])
+
+
+class TooManyErrors(Exception):
+    """
+    error count reached max errors, assembling stops.
+    """
+
+
+class Diagnostics(object):
+    """
+    errors of an assembler run.
+    errors are kept as compact records in a buffer of capacity records, later errors are counted only.
+    rows are formatted when errors are reported, not while assembling.
+    """
+    def __init__(self, capacity=1000, max_errors=None):
+        """
+        :param capacity: max kept records, None for no limit.
+        :param max_errors: raise TooManyErrors when error count reaches it, None for no limit.
+        """
+        self.records = []
+        self.count = 0
+        self.capacity = capacity
+        self.max_errors = max_errors
+
+    def error(self, index, code, token=''):
+        """
+        record an error.
+        :param index: row index of code, None for no row.
+        :param code: error code.
+        :param token: symbol, operator or operand which caused error.
+        """
+        self.count += 1
+        if self.capacity is None or len(self.records) < self.capacity:
+            self.records.append(Diagnostic(index, code, token))
+        if self.max_errors is not None and self.count >= self.max_errors:
+            raise TooManyErrors(str(self.count) + ' errors.')
+
+    def extend(self, records, offset=0):
+        """
+        record errors of another run, ex: control section assembled in worker process.
+        :param records: [Diagnostic]
+        :param offset: added into row index.
+        """
+        for index, code, token in records:
+            self.error(None if index is None else index + offset, code, token)
+
+    @property
+    def dropped(self):
+        """
+        :return: errors which are counted but not kept.
+        """
+        return self.count - len(self.records)
+
+    def messages(self, row):
+        """
+        error messages in record order.
+        :param row: function(row index) -> row string.
+        :return: generator of string.
+        """
+        for index, code, token in self.records:
+            if index is None:
+                yield MESSAGE[code].format(token).lstrip(' ')
+            else:
+                yield row(index) + MESSAGE[code].format(token)
+        if self.dropped > 0:
+            yield str(self.dropped) + ' more errors.'
+
+    def report(self, row, file=None):
+        """
+        write error messages.
+        :param row: function(row index) -> row string.
+        :param file: text file-like object, None for stdout.
+        """
+        file = sys.stdout if file is None else file
+        for message in self.messages(row):
+            file.write(message + '\n')
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.records)
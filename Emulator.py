@@ -0,0 +1,490 @@
+import argparse
+import math
+import os
+import sys
+import time
+import Loader
+import Optab
+
+# register number, same as SicXE register table.
+A, X, L, B, S, T, F, PC, SW = 0, 1, 2, 3, 4, 5, 6, 8, 9
+REGISTER = {'A': A, 'X': X, 'L': L, 'B': B, 'S': S, 'T': T, 'F': F, 'PC': PC, 'SW': SW}
+
+# word is 24 bits, SIC/XE memory is 2^20 bytes.
+WORD_MASK = 0xFFFFFF
+ADDRESS_MASK = 0xFFFFF
+MEMORY_SIZE = 1 << 20
+
+# condition code in SW.
+LT = 0x40
+EQ = 0x00
+GT = 0x80
+
+# addressing mode(n i bits) of predecoded format 3 and 4 instruction, SIC instruction is SIMPLE.
+SIMPLE = 3
+INDIRECT = 2
+IMMEDIATE = 1
+
+
+def signed(word):
+    """
+    :param word: 24 bits word.
+    :return: two's complement value.
+    """
+    return word - 0x1000000 if word & 0x800000 else word
+
+
+def to_float(data):
+    """
+    SIC/XE 48 bits float: sign(1) | exponent(11) | fraction(36), value = fraction * 2 ^ (exponent - 1024).
+    :param data: 6 bytes.
+    :return: float.
+    """
+    word = int.from_bytes(data, 'big')
+    fraction = word & ((1 << 36) - 1)
+    value = math.ldexp(fraction, ((word >> 36) & 0x7FF) - 1024 - 36)
+    return -value if word >> 47 else value
+
+
+def from_float(value):
+    """
+    :param value: float.
+    :return: 6 bytes SIC/XE float.
+    """
+    if value == 0:
+        return bytes(6)
+
+    fraction, exponent = math.frexp(abs(value))
+    exponent = min(max(exponent + 1024, 0), 0x7FF)
+    word = (1 << 47 if value < 0 else 0) | exponent << 36 | int(fraction * (1 << 36))
+    return word.to_bytes(6, 'big')
+
+
+class Device(object):
+    """
+    I/O device, input is read byte by byte, 0 after input ends.
+    """
+    def __init__(self, data=b''):
+        """
+        :param data: input bytes.
+        """
+        self.input = bytes(data)
+        self.output = bytearray()
+        self.__offset = 0
+
+    def read(self):
+        """
+        :return: next input byte, 0 at end of input.
+        """
+        if self.__offset >= len(self.input):
+            return 0
+        self.__offset += 1
+        return self.input[self.__offset - 1]
+
+    def write(self, byte):
+        """
+        :param byte: output byte.
+        """
+        self.output.append(byte)
+
+
+class Emulator(object):
+    """
+    SIC and SIC/XE machine over bytearray memory.
+    instruction is decoded once into (handler, length, ...) and cached by address,
+    store into memory drops cached instructions which overlap it, so self-modifying code still works.
+    predecoded structure:
+        format 1: (handler, 1)
+        format 2: (handler, 2, r1, r2)
+        format 3/4 and SIC: (handler, length, target, base relative, indexed, addressing mode)
+        pc relative target is resolved at decode time.
+    machine halts when PC leaves memory(RSUB of main program returns to initial L) or J jumps to itself.
+    """
+    def __init__(self, op_file, memory=None, devices=None):
+        """
+        :param op_file: operator file(.csv)
+        :param memory: bytearray, None for 2^20 bytes.
+        :param devices: {device number: Device}, device is made when program uses it.
+        """
+        self.memory = memory if memory is not None else bytearray(MEMORY_SIZE)
+        self.devices = devices if devices is not None else {}
+        self.register = [0] * 10
+        self.register[F] = 0.0
+        self.register[L] = len(self.memory)
+        self.halted = False
+        self.steps = 0
+        self.__cache = {}
+        self.__table = [None] * 256
+
+        handler = {
+            'ADD': self.__add, 'ADDF': self.__addf, 'ADDR': self.__addr, 'AND': self.__and,
+            'CLEAR': self.__clear, 'COMP': self.__comp, 'COMPF': self.__compf, 'COMPR': self.__compr,
+            'DIV': self.__div, 'DIVF': self.__divf, 'DIVR': self.__divr, 'FIX': self.__fix, 'FLOAT': self.__float,
+            'J': self.__j, 'JEQ': self.__jeq, 'JGT': self.__jgt, 'JLT': self.__jlt, 'JSUB': self.__jsub,
+            'LDA': self.__loader(A), 'LDB': self.__loader(B), 'LDCH': self.__ldch, 'LDF': self.__ldf,
+            'LDL': self.__loader(L), 'LDS': self.__loader(S), 'LDT': self.__loader(T), 'LDX': self.__loader(X),
+            'MUL': self.__mul, 'MULF': self.__mulf, 'MULR': self.__mulr, 'OR': self.__or, 'RD': self.__rd,
+            'RMO': self.__rmo, 'RSUB': self.__rsub, 'SHIFTL': self.__shiftl, 'SHIFTR': self.__shiftr,
+            'STA': self.__storer(A), 'STB': self.__storer(B), 'STCH': self.__stch, 'STF': self.__stf,
+            'STL': self.__storer(L), 'STS': self.__storer(S), 'STSW': self.__storer(SW), 'STT': self.__storer(T),
+            'STX': self.__storer(X), 'SUB': self.__sub, 'SUBF': self.__subf, 'SUBR': self.__subr, 'TD': self.__td,
+            'TIX': self.__tix, 'TIXR': self.__tixr, 'WD': self.__wd,
+        }
+        for operator, entry in Optab.load(op_file).items():
+            # privileged and I/O channel instruction(HIO, SIO, TIO, LPS, SSK, STI, SVC, NORM) do nothing.
+            self.__table[entry.opcode] = (handler.get(operator, self.__nop), entry.format)
+
+    def load(self, files, address=None):
+        """
+        link object files into memory, PC is set to first executable instruction.
+        :param files: object files in load order.
+        :param address: load address, None for start address of first section.
+        :return: Loader.Image.
+        """
+        image = Loader.load(files, address)
+        self.memory[image.address:image.address + len(image.memory)] = image.memory
+        self.register[PC] = image.entry
+        self.__cache.clear()
+        return image
+
+    def run(self, limit=None):
+        """
+        run until machine halts.
+        :param limit: max instructions, None for no limit.
+        :return: executed instructions.
+        """
+        register = self.register
+        cache = self.__cache
+        decode = self.__decode
+        limit = -1 if limit is None else limit
+        steps = 0
+        self.halted = False
+        while steps != limit and not self.halted:
+            pc = register[PC]
+            instruction = cache.get(pc)
+            if instruction is None:
+                instruction = decode(pc)
+                if instruction is None:
+                    self.halted = True
+                    break
+                cache[pc] = instruction
+            register[PC] = pc + instruction[1]
+            instruction[0](instruction)
+            steps += 1
+
+        self.steps += steps
+        return steps
+
+    def __decode(self, pc):
+        """
+        :param pc: instruction address.
+        :return: predecoded instruction, None if pc is out of memory.
+        """
+        memory = self.memory
+        if pc >= len(memory):
+            return None
+
+        entry = self.__table[memory[pc] & 0xFC]
+        if entry is None:
+            raise RuntimeError(format(memory[pc], '02X') + ' at ' + format(pc, '06X') + ' is invalid opcode.')
+
+        handler, form = entry
+        if form == Optab.Format.ONE:
+            return handler, 1
+        if form == Optab.Format.TWO:
+            return handler, 2, memory[pc + 1] >> 4, memory[pc + 1] & 0xF
+
+        mode = memory[pc] & 3
+        flag = memory[pc + 1]
+        if mode == 0:
+            # SIC: opcode(8) | x(1) | address(15)
+            return handler, 3, (flag & 0x7F) << 8 | memory[pc + 2], False, bool(flag & 0x80), SIMPLE
+
+        if flag & 0x10:
+            # format 4: opcode(6) | n i x b p e | address(20)
+            return (handler, 4, (flag & 0xF) << 16 | memory[pc + 2] << 8 | memory[pc + 3], False, bool(flag & 0x80),
+                    mode)
+
+        # format 3: opcode(6) | n i x b p e | displacement(12)
+        target = (flag & 0xF) << 8 | memory[pc + 2]
+        if flag & 0x20:
+            target = pc + 3 + (target - 0x1000 if target & 0x800 else target)
+        return handler, 3, target, bool(flag & 0x40), bool(flag & 0x80), mode
+
+    def __target(self, instruction):
+        """
+        :param instruction: predecoded format 3/4 instruction.
+        :return: target address before indirect.
+        """
+        target = instruction[2]
+        if instruction[3]:
+            target += self.register[B]
+        if instruction[4]:
+            target += self.register[X]
+        return target & ADDRESS_MASK
+
+    def __address(self, instruction):
+        """
+        :param instruction: predecoded format 3/4 instruction.
+        :return: operand address.
+        """
+        target = self.__target(instruction)
+        if instruction[5] == INDIRECT:
+            # not masked, so J @RETADR of main program leaves memory like RSUB.
+            target = self.__word(target)
+        return target
+
+    def __value(self, instruction):
+        """
+        :param instruction: predecoded format 3/4 instruction.
+        :return: operand word.
+        """
+        if instruction[5] == IMMEDIATE:
+            return self.__target(instruction)
+        return self.__word(self.__address(instruction))
+
+    def __byte(self, instruction):
+        """
+        :param instruction: predecoded format 3/4 instruction.
+        :return: operand byte.
+        """
+        if instruction[5] == IMMEDIATE:
+            return self.__target(instruction) & 0xFF
+        return self.memory[self.__address(instruction)]
+
+    def __word(self, address):
+        memory = self.memory
+        return memory[address] << 16 | memory[address + 1] << 8 | memory[address + 2]
+
+    def __store(self, address, data):
+        """
+        store bytes, cached instructions which overlap them are dropped.
+        :param address: memory address.
+        :param data: bytes.
+        """
+        self.memory[address:address + len(data)] = data
+        cache = self.__cache
+        # format 4 is the longest instruction, it may begin 3 bytes before address.
+        for pc in range(address - 3, address + len(data)):
+            cache.pop(pc, None)
+
+    def __compare(self, a, b):
+        self.register[SW] = LT if a < b else GT if a > b else EQ
+
+    def __loader(self, r):
+        def load(instruction):
+            self.register[r] = self.__value(instruction)
+        return load
+
+    def __storer(self, r):
+        def store(instruction):
+            self.__store(self.__address(instruction), (self.register[r] & WORD_MASK).to_bytes(3, 'big'))
+        return store
+
+    def __nop(self, instruction):
+        pass
+
+    def __add(self, instruction):
+        self.register[A] = (self.register[A] + self.__value(instruction)) & WORD_MASK
+
+    def __sub(self, instruction):
+        self.register[A] = (self.register[A] - self.__value(instruction)) & WORD_MASK
+
+    def __mul(self, instruction):
+        self.register[A] = (signed(self.register[A]) * signed(self.__value(instruction))) & WORD_MASK
+
+    def __div(self, instruction):
+        self.register[A] = _divide(self.register[A], self.__value(instruction))
+
+    def __and(self, instruction):
+        self.register[A] &= self.__value(instruction)
+
+    def __or(self, instruction):
+        self.register[A] |= self.__value(instruction)
+
+    def __comp(self, instruction):
+        self.__compare(signed(self.register[A]), signed(self.__value(instruction)))
+
+    def __tix(self, instruction):
+        self.register[X] = (self.register[X] + 1) & WORD_MASK
+        self.__compare(signed(self.register[X]), signed(self.__value(instruction)))
+
+    def __ldch(self, instruction):
+        self.register[A] = (self.register[A] & 0xFFFF00) | self.__byte(instruction)
+
+    def __stch(self, instruction):
+        self.__store(self.__address(instruction), bytes([self.register[A] & 0xFF]))
+
+    def __j(self, instruction):
+        target = self.__address(instruction)
+        if target == self.register[PC] - instruction[1]:
+            # J to itself is halt.
+            self.halted = True
+        self.register[PC] = target
+
+    def __jeq(self, instruction):
+        if self.register[SW] == EQ:
+            self.register[PC] = self.__address(instruction)
+
+    def __jgt(self, instruction):
+        if self.register[SW] == GT:
+            self.register[PC] = self.__address(instruction)
+
+    def __jlt(self, instruction):
+        if self.register[SW] == LT:
+            self.register[PC] = self.__address(instruction)
+
+    def __jsub(self, instruction):
+        self.register[L] = self.register[PC]
+        self.register[PC] = self.__address(instruction)
+
+    def __rsub(self, instruction):
+        self.register[PC] = self.register[L]
+
+    def __device(self, instruction):
+        number = self.__byte(instruction)
+        if number not in self.devices:
+            self.devices[number] = Device()
+        return self.devices[number]
+
+    def __td(self, instruction):
+        # device is always ready.
+        self.__device(instruction)
+        self.register[SW] = LT
+
+    def __rd(self, instruction):
+        self.register[A] = (self.register[A] & 0xFFFF00) | self.__device(instruction).read()
+
+    def __wd(self, instruction):
+        self.__device(instruction).write(self.register[A] & 0xFF)
+
+    def __ldf(self, instruction):
+        if instruction[5] == IMMEDIATE:
+            self.register[F] = float(self.__target(instruction))
+        else:
+            address = self.__address(instruction)
+            self.register[F] = to_float(self.memory[address:address + 6])
+
+    def __stf(self, instruction):
+        self.__store(self.__address(instruction), from_float(self.register[F]))
+
+    def __float_value(self, instruction):
+        if instruction[5] == IMMEDIATE:
+            return float(self.__target(instruction))
+        address = self.__address(instruction)
+        return to_float(self.memory[address:address + 6])
+
+    def __addf(self, instruction):
+        self.register[F] += self.__float_value(instruction)
+
+    def __subf(self, instruction):
+        self.register[F] -= self.__float_value(instruction)
+
+    def __mulf(self, instruction):
+        self.register[F] *= self.__float_value(instruction)
+
+    def __divf(self, instruction):
+        self.register[F] /= self.__float_value(instruction)
+
+    def __compf(self, instruction):
+        self.__compare(self.register[F], self.__float_value(instruction))
+
+    def __fix(self, instruction):
+        self.register[A] = int(self.register[F]) & WORD_MASK
+
+    def __float(self, instruction):
+        self.register[F] = float(signed(self.register[A]))
+
+    def __addr(self, instruction):
+        self.register[instruction[3]] = (self.register[instruction[3]] + self.register[instruction[2]]) & WORD_MASK
+
+    def __subr(self, instruction):
+        self.register[instruction[3]] = (self.register[instruction[3]] - self.register[instruction[2]]) & WORD_MASK
+
+    def __mulr(self, instruction):
+        self.register[instruction[3]] = (signed(self.register[instruction[3]]) *
+                                         signed(self.register[instruction[2]])) & WORD_MASK
+
+    def __divr(self, instruction):
+        self.register[instruction[3]] = _divide(self.register[instruction[3]], self.register[instruction[2]])
+
+    def __compr(self, instruction):
+        self.__compare(signed(self.register[instruction[2]]), signed(self.register[instruction[3]]))
+
+    def __clear(self, instruction):
+        self.register[instruction[2]] = 0.0 if instruction[2] == F else 0
+
+    def __rmo(self, instruction):
+        self.register[instruction[3]] = self.register[instruction[2]]
+
+    def __tixr(self, instruction):
+        self.register[X] = (self.register[X] + 1) & WORD_MASK
+        self.__compare(signed(self.register[X]), signed(self.register[instruction[2]]))
+
+    def __shiftl(self, instruction):
+        # circular shift, second operand is n - 1.
+        n = (instruction[3] + 1) % 24
+        word = self.register[instruction[2]]
+        self.register[instruction[2]] = ((word << n) | (word >> (24 - n))) & WORD_MASK
+
+    def __shiftr(self, instruction):
+        # arithmetic shift, sign bit fills left.
+        self.register[instruction[2]] = (signed(self.register[instruction[2]]) >> (instruction[3] + 1)) & WORD_MASK
+
+
+def _divide(a, b):
+    """
+    24 bits signed division, quotient is truncated toward 0.
+    :param a: dividend word.
+    :param b: divisor word.
+    :return: quotient word.
+    """
+    a, b = signed(a), signed(b)
+    if b == 0:
+        raise ZeroDivisionError('division by zero.')
+    quotient = abs(a) // abs(b)
+    return (-quotient if (a < 0) != (b < 0) else quotient) & WORD_MASK
+
+
+def main(argv=None):
+    """
+    command line emulator.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='run SIC and SIC/XE object files.')
+    parser.add_argument('files', nargs='+', help='object files')
+    parser.add_argument('-a', '--address', type=lambda s: int(s, 16), help='load address(hexadecimal)')
+    parser.add_argument('-o', '--optab', default=os.path.join(path, 'opcode.csv'), help='operator file(.csv)')
+    parser.add_argument('-i', '--input', action='append', default=[],
+                        help='device input, DEVICE=FILE, ex: F1=input.txt')
+    parser.add_argument('-n', '--limit', type=int, help='max instructions')
+    args = parser.parse_args(argv)
+
+    emulator = Emulator(args.optab)
+    for option in args.input:
+        device, file_name = option.split('=', 1)
+        with open(file_name, 'rb') as file:
+            emulator.devices[int(device, 16)] = Device(file.read())
+
+    image = emulator.load(args.files, args.address)
+    for error in image.errors:
+        print(error)
+
+    begin = time.perf_counter()
+    steps = emulator.run(args.limit)
+    seconds = time.perf_counter() - begin
+
+    for device, unit in sorted(emulator.devices.items()):
+        if len(unit.output) > 0:
+            print('device ' + format(device, '02X') + ': ' + unit.output.decode('latin-1'))
+    print(' '.join(name + '=' + (format(emulator.register[r], '06X') if r != F else repr(emulator.register[r]))
+                   for name, r in REGISTER.items()))
+    print(str(steps) + ' instructions, ' + format(seconds, '.4f') + ' s, ' +
+          format(steps / seconds / 1e6 if seconds > 0 else 0, '.2f') + ' MIPS')
+    return 1 if len(image.errors) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import argparse
+import random
+import sys
+
+# instructions used by generated code, every operand kind is valid for them.
+FORMAT2 = ['ADDR\tA,S', 'SUBR\tS,A', 'COMPR\tA,T', 'RMO\tA,B', 'CLEAR\tX', 'TIXR\tT', 'MULR\tS,T']
+LOAD = ['LDA', 'LDS', 'LDT', 'ADD', 'SUB', 'COMP', 'AND', 'OR']
+STORE = ['STA', 'STS', 'STT', 'STX']
+JUMP = ['J', 'JEQ', 'JGT', 'JLT']
+SIC_LOAD = ['LDA', 'ADD', 'SUB', 'COMP', 'LDX', 'TIX', 'AND', 'OR', 'MUL']
+SIC_STORE = ['STA', 'STX', 'STL']
+
+# instructions per chunk, a chunk is code followed by its own data.
+CHUNK = 24
+# max chunks between LTORG, keeps literal pool in PC relative range of every chunk which uses it.
+MAX_LTORG = 8
+
+
+def generate(lines=1000, machine='SICXE', format2=1, format3=6, format4=1, literal=0.1, ltorg=4, equ=True,
+             org=True, blocks=0, csects=1, extref=0.2, seed=0):
+    """
+    generate valid assembly code of about lines rows.
+    code is made of chunks, a chunk is CHUNK instructions and their data, format 3 instruction only refers
+    symbols of its own chunk so PC relative displacement always fits.
+    SIC: format 3 instructions with simple and indexed address, WORD, BYTE, RESW, RESB.
+    SIC/XE: also format 2 and 4, immediate, indirect, literals with LTORG, EQU, ORG, USE blocks for data,
+            control sections with EXTDEF and EXTREF.
+    SIC address is 15 bits, SIC code over 32K bytes is assembled but its addresses wrap.
+    :param lines: row quantity, 1k to 1M.
+    :param machine: 'SIC' or 'SICXE'.
+    :param format2: weight of format 2 instruction.
+    :param format3: weight of format 3 instruction.
+    :param format4: weight of format 4 instruction.
+    :param literal: ratio of format 3 instruction with literal operand.
+    :param ltorg: chunks between LTORG(1 to MAX_LTORG).
+    :param equ: whether chunk data define EQU symbols.
+    :param org: whether chunk data redefine storage with ORG.
+    :param blocks: USE block quantity for data, 0 for data after code in default block.
+    :param csects: control section quantity.
+    :param extref: ratio of format 4 instruction which refers external symbol of other control section.
+    :param seed: random seed, the same arguments generate the same code.
+    :return: generator of row(string, tab separated, without newline).
+    """
+    rand = random.Random(seed)
+    if machine == 'SIC':
+        yield from _sic(rand, lines)
+        return
+
+    ltorg = min(max(ltorg, 1), MAX_LTORG)
+    csects = max(csects, 1)
+    # rows per chunk is about CHUNK instructions + data + directives.
+    chunks = max(lines // (CHUNK + 16), csects)
+    weights = [format2, format3, format4]
+
+    count = 0
+    pool = 0
+    for k in range(chunks):
+        section = k * csects // chunks
+        head = (k == 0 or section != (k - 1) * csects // chunks)
+        if head:
+            # control section head.
+            if section == 0:
+                yield 'PROG\tSTART\t0'
+            else:
+                yield 'S' + str(section) + '\tCSECT'
+            yield '\tEXTDEF\tX' + str(section)
+            if csects > 1:
+                yield '\tEXTREF\tX' + str((section - 1) % csects)
+            count = 0
+
+        yield from _chunk(rand, k, head, pool, section, csects, weights, literal, equ, org, blocks, extref)
+        count += 1
+        last = (k == chunks - 1 or section != (k + 1) * csects // chunks)
+        if literal > 0 and (count % ltorg == 0 or last):
+            yield '\tLTORG'
+            pool += 1
+
+    yield '\tEND\tC0A'
+
+
+def _chunk(rand, k, head, pool, section, csects, weights, literal, equ, org, blocks, extref):
+    """
+    rows of a chunk.
+    labels: C<k><letter> code, D<k><letter> data, E<k><letter> EQU, X<section> external definition.
+    :param head: whether chunk is first chunk of control section.
+    :param pool: literal pool number, literal value is unique per pool because a literal refers to
+                 the last pool which places it.
+    :return: generator of row.
+    """
+    c = 'C' + str(k)
+    d = 'D' + str(k)
+    e = 'E' + str(k)
+    # data in USE block is far from code, only format 4 can refer it.
+    far = blocks > 0
+    words = [d + letter for letter in 'ABCD']
+    local = list(words)
+    if equ:
+        local.append(e + 'A')
+    external = 'X' + str((section - 1) % csects) if csects > 1 else None
+
+    for j in range(CHUNK):
+        label = c + chr(ord('A') + j) if j % 4 == 0 else ''
+        kind = rand.choices([2, 3, 4], weights)[0]
+        if kind == 2:
+            yield label + '\t' + rand.choice(FORMAT2)
+        elif kind == 3:
+            r = rand.random()
+            if r < literal:
+                operand = rand.choice(["=C'" + rand.choice('ABC') + str(pool) + "'",
+                                       "=X'" + format(pool * 4 + rand.randrange(4), '06X') + "'"])
+                yield label + '\t' + rand.choice(LOAD) + '\t' + operand
+            elif r < literal + 0.2:
+                yield label + '\t' + rand.choice(LOAD) + '\t#' + str(rand.randrange(4096))
+            elif r < literal + 0.3:
+                # jump to a label of this chunk.
+                yield label + '\t' + rand.choice(JUMP) + '\t' + c + chr(ord('A') + rand.randrange(0, CHUNK, 4))
+            elif r < literal + 0.35 and equ:
+                yield label + '\tLDA\t#' + e + 'B'
+            elif far:
+                yield label + '\t' + rand.choice(LOAD) + '\t#' + str(rand.randrange(4096))
+            elif r < literal + 0.45:
+                yield label + '\tLDCH\t' + d + 'T,X'
+            elif r < literal + 0.5:
+                yield label + '\tLDA\t@' + d + 'A'
+            elif r < literal + 0.75:
+                yield label + '\t' + rand.choice(STORE) + '\t' + rand.choice(local)
+            else:
+                yield label + '\t' + rand.choice(LOAD) + '\t' + rand.choice(local)
+        else:
+            if external is not None and rand.random() < extref:
+                yield label + '\t+' + rand.choice(['LDA', 'LDT', 'JSUB']) + '\t' + external
+            elif rand.random() < 0.3:
+                yield label + '\t+LDA\t#' + str(rand.randrange(4096, 1 << 20))
+            else:
+                yield label + '\t+' + rand.choice(LOAD + STORE) + '\t' + rand.choice(words)
+
+    # skip data.
+    yield '\tJ\t' + c + 'Z'
+
+    if far:
+        yield '\tUSE\tB' + str(k % blocks)
+    for letter in 'ABCD':
+        yield d + letter + '\tWORD\t' + str(rand.randrange(1 << 23))
+    yield d + 'S\tBYTE\tC\'' + rand.choice(['EOF', 'DATA', 'SICXE']) + '\''
+    yield d + 'T\tRESB\t6'
+    if org:
+        # redefine table storage as two 3 bytes fields.
+        yield '\tORG\t' + d + 'T'
+        yield d + 'U\tRESB\t3'
+        yield d + 'V\tRESB\t3'
+        yield '\tORG\t' + d + 'T+6'
+    if equ:
+        yield e + 'A\tEQU\t' + d + 'B'
+        yield e + 'B\tEQU\t' + d + 'D-' + d + 'A'
+    if external is not None:
+        yield d + 'X\tWORD\t' + external
+    if head:
+        # external definition of this control section.
+        yield 'X' + str(section) + '\tWORD\t' + str(k)
+    if far:
+        yield '\tUSE'
+    yield c + 'Z\tCLEAR\tA'
+
+
+def _sic(rand, lines):
+    """
+    rows of SIC code.
+    :param rand: random.Random.
+    :param lines: row quantity.
+    :return: generator of row.
+    """
+    yield 'PROG\tSTART\t1000'
+    chunks = max(lines // (CHUNK + 8), 1)
+    for k in range(chunks):
+        c = 'C' + str(k)
+        d = 'D' + str(k)
+        words = [d + letter for letter in 'ABCD']
+        for j in range(CHUNK):
+            label = c + chr(ord('A') + j) if j % 4 == 0 else ''
+            r = rand.random()
+            if r < 0.1:
+                yield label + '\t' + rand.choice(JUMP) + '\t' + c + chr(ord('A') + rand.randrange(0, CHUNK, 4))
+            elif r < 0.2:
+                yield label + '\tLDCH\t' + d + 'T,X'
+            elif r < 0.45:
+                yield label + '\t' + rand.choice(SIC_STORE) + '\t' + rand.choice(words)
+            else:
+                yield label + '\t' + rand.choice(SIC_LOAD) + '\t' + rand.choice(words)
+        yield '\tJ\t' + c + 'Z'
+        for letter in 'ABCD':
+            yield d + letter + '\tWORD\t' + str(rand.randrange(1 << 23))
+        yield d + 'S\tBYTE\tC\'' + rand.choice(['EOF', 'DATA']) + '\''
+        yield d + 'T\tRESB\t6'
+        yield c + 'Z\tLDA\t' + d + 'A'
+    yield '\tEND\tPROG'
+
+
+def write(file_name, **options):
+    """
+    write generated assembly code into file.
+    :param file_name: assembly code file(.txt).
+    :param options: arguments of generate.
+    :return: row quantity.
+    """
+    count = 0
+    with open(file_name, 'w') as file:
+        for row in generate(**options):
+            file.write(row + '\n')
+            count += 1
+    return count
+
+
+def add_arguments(parser):
+    """
+    add generate options into command line parser, shared by generator and benchmark.
+    :param parser: argparse.ArgumentParser.
+    """
+    parser.add_argument('--machine', choices=['SIC', 'SICXE'], default='SICXE')
+    parser.add_argument('--format2', type=float, default=1, help='weight of format 2 instruction')
+    parser.add_argument('--format3', type=float, default=6, help='weight of format 3 instruction')
+    parser.add_argument('--format4', type=float, default=1, help='weight of format 4 instruction')
+    parser.add_argument('--literal', type=float, default=0.1, help='ratio of literal operand')
+    parser.add_argument('--ltorg', type=int, default=4, help='chunks between LTORG')
+    parser.add_argument('--no-equ', dest='equ', action='store_false', help='no EQU')
+    parser.add_argument('--no-org', dest='org', action='store_false', help='no ORG')
+    parser.add_argument('--blocks', type=int, default=0, help='USE blocks for data')
+    parser.add_argument('--csects', type=int, default=1, help='control sections')
+    parser.add_argument('--extref', type=float, default=0.2, help='ratio of format 4 external reference')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+# names of generate options in parsed arguments.
+OPTIONS = ['machine', 'format2', 'format3', 'format4', 'literal', 'ltorg', 'equ', 'org', 'blocks', 'csects',
+           'extref', 'seed']
+
+
+def main(argv=None):
+    """
+    command line generator.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description='generate synthetic SIC and SIC/XE assembly code.')
+    parser.add_argument('file', help='assembly code file to write')
+    parser.add_argument('-n', '--lines', type=int, default=1000, help='row quantity')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    options = {option: getattr(args, option) for option in OPTIONS}
+    print(str(write(args.file, lines=args.lines, **options)) + ' rows')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
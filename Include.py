@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sys
+import Arithmetic as A
+import Cache
+import Source
+
+# include directives, operand is file name, quote is optional. ex: INCLUDE 'CONST.txt'
+DIRECTIVES = ('INCLUDE', 'COPY')
+
+# parsed include files: {digest: (rows, absolute)}.
+_parsed = {}
+
+
+def load(file_name):
+    """
+    load include file once per process, it is parsed again only when its content changes.
+    files with the same content share one parsed entry.
+    rows: tuple of (symbol, operator, operand).
+    absolute: {row index: value} of EQU rows whose operand has integers only, they are resolved here once.
+    :param file_name: include file(.txt).
+    :return: (digest, rows, absolute).
+    """
+    sha = _files.get(file_name)
+    return (sha,) + _parsed[sha]
+
+
+def _load(path):
+    """
+    read include file, parse it if no file with the same content is parsed, it runs under lock of _files.
+    :param path: include file(.txt).
+    :return: digest.
+    """
+    with open(path, 'rb') as file:
+        content = file.read()
+    sha = hashlib.sha256(content).hexdigest()
+    if sha not in _parsed:
+        _parsed[sha] = _parse(content.decode())
+    return sha
+
+
+# digest of each include file.
+_files = Cache.FileCache(_load)
+
+
+def _parse(content):
+    """
+    :param content: include file content.
+    :return: (rows, absolute), see load.
+    """
+    intern = sys.intern
+    rows = []
+    absolute = {}
+    for line in content.splitlines():
+        row = line.split('\t')
+        if len(row) < 3:
+            row += [''] * (3 - len(row))
+        symbol, operator, operand = intern(row[0]), intern(row[1]), intern(row[2])
+        if operator == 'EQU' and symbol not in ('', '.') and operand.find('*') < 0 and operand.find('/') < 0:
+            terms, _ = A.compile_expression(operand)
+            if all(value is not None for _, _, value in terms):
+                # integers only, same value as pass1 computes.
+                try:
+                    absolute[len(rows)] = A.expression({}, (), operand).value
+                except (IndexError, KeyError):
+                    # invalid expression is reported by pass1.
+                    pass
+        rows.append((symbol, operator, operand))
+    return tuple(rows), absolute
+
+
+def lines(file_name):
+    """
+    rows of include file as new Line, resolved EQU rows carry their value.
+    :param file_name: include file(.txt).
+    :return: generator of Line.
+    """
+    _, rows, absolute = load(file_name)
+    for index, (symbol, operator, operand) in enumerate(rows):
+        line = Source.Line(symbol, operator, operand)
+        if index in absolute:
+            line.value = absolute[index]
+        yield line
+
+
+def resolve(name, directory, include_path=()):
+    """
+    find include file, relative name is searched in directory of including file, then include path.
+    :param name: operand of include row.
+    :param directory: directory of including file.
+    :param include_path: include directories.
+    :return: absolute path, None if not found.
+    """
+    name = name.strip("'\"")
+    if name == '':
+        return None
+    for base in (directory,) + tuple(include_path):
+        path = os.path.abspath(os.path.join(base, name))
+        if os.path.isfile(path):
+            return path
+    return None
+
@@ -0,0 +1,114 @@
+import queue
+import threading
+import Arithmetic as A
+import Record
+
+# figure row: location(7) block(3) symbol(15) operator(15) operand(15) object code, SIC has no block.
+XE_ROW = '%-7s%-3s%-15s%-15s%-15s%s'
+SIC_ROW = '%-7s%-15s%-15s%-15s%s'
+
+# rows per chunk, a chunk is one write.
+CHUNK = 4096
+
+
+def location(loc):
+    """
+    :param loc: location, '' for row without location.
+    :return: 4 columns hexadecimal, '' for row without location.
+    """
+    if loc == '':
+        return ''
+    return '%04X' % loc if loc >= 0 else A.output_hex(loc, 4)
+
+
+def render(line, xe=True):
+    """
+    a row of figure.
+    :param line: Line of code or literal pool.
+    :param xe: whether figure has block column.
+    :return: string (location block symbol operator operand object code).
+    """
+    if xe:
+        return XE_ROW % (location(line.loc), line.block, line.symbol, line.operator, line.operand,
+                         line.object_code.hex().upper())
+    return SIC_ROW % (location(line.loc), line.symbol, line.operator, line.operand, line.object_code.hex().upper())
+
+
+def chunks(lines, xe=True, size=CHUNK):
+    """
+    render rows in bulk.
+    :param lines: iterable of Line.
+    :param xe: whether figure has block column.
+    :param size: rows per chunk.
+    :return: generator of string, size rows with line break each.
+    """
+    rows = []
+    for line in lines:
+        rows.append(render(line, xe))
+        if len(rows) == size:
+            rows.append('')
+            yield '\n'.join(rows)
+            rows = []
+    if len(rows) > 0:
+        rows.append('')
+        yield '\n'.join(rows)
+
+
+class ListingWriter(Record.Writer):
+    """
+    write figure rows into one buffered stream, a chunk of rows is one write.
+    in background, rows are rendered and written on a thread while caller goes on, ex: object code emission.
+    """
+    def __init__(self, file, xe=True, background=False):
+        """
+        :param file: figure file name, or any file-like object which has write.
+        :param xe: whether figure has block column.
+        :param background: whether render and write rows on a background thread.
+        """
+        super().__init__(file)
+        self.__xe = xe
+        self.__queue = None
+        self.__thread = None
+        self.__error = None
+        if background:
+            self.__queue = queue.Queue()
+            self.__thread = threading.Thread(target=self.__work, daemon=True)
+            self.__thread.start()
+
+    def write(self, lines):
+        """
+        write rows, in background they are queued and rendered later, so they must be assembled already.
+        :param lines: iterable of Line.
+        """
+        if self.__queue is not None:
+            self.__queue.put(lines)
+        else:
+            self.__write(lines)
+
+    def __write(self, lines):
+        for chunk in chunks(lines, self.__xe):
+            self._file.write(chunk)
+
+    def __work(self):
+        while True:
+            lines = self.__queue.get()
+            if lines is None:
+                return
+            if self.__error is None:
+                try:
+                    self.__write(lines)
+                except Exception as e:
+                    # raised again by close.
+                    self.__error = e
+
+    def close(self):
+        """
+        wait for queued rows, close file opened by writer, file-like object given by caller is flushed only.
+        """
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__thread = None
+        super().close()
+        if self.__error is not None:
+            raise self.__error
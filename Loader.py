@@ -0,0 +1,178 @@
+import argparse
+import sys
+import Binary
+import Record
+
+
+class Image(object):
+    """
+    memory image made by linking loader.
+    address: load address of memory[0].
+    memory: bytearray of all control sections.
+    estab: external symbol table {control section name or external symbol: address}
+    entry: first executable instruction address.
+    errors: duplicate or undefined external symbol messages.
+    """
+    __slots__ = ('address', 'memory', 'estab', 'entry', 'errors')
+
+    def __init__(self, address, memory, estab, entry, errors):
+        self.address = address
+        self.memory = memory
+        self.estab = estab
+        self.entry = entry
+        self.errors = errors
+
+
+def read(file_name):
+    """
+    read object file, binary object file is detected by its magic.
+    :param file_name: object code file(.txt) or binary object file.
+    :return: [Record.Section]
+    """
+    with open(file_name, 'rb') as file:
+        magic = file.read(len(Binary.MAGIC))
+
+    if magic == Binary.MAGIC:
+        return Binary.load(file_name)[1]
+
+    with open(file_name, 'r') as file:
+        return Record.parse(file.read())[1]
+
+
+def _modify(memory, at, half, value, sign=''):
+    """
+    add value to a field of memory, or subtract it.
+    :param memory: bytearray.
+    :param at: first byte of field.
+    :param half: field length(half byte), field is low half bytes, odd length begins at second half of first byte.
+    :param value: integer.
+    :param sign: '-' for subtraction.
+    """
+    size = (half + 1) // 2
+    word = int.from_bytes(memory[at:at + size], 'big')
+    mask = (1 << half * 4) - 1
+    field = word & mask
+    field = (field - value if sign == '-' else field + value) & mask
+    memory[at:at + size] = ((word & ~mask) | field).to_bytes(size, 'big')
+
+
+def link(sections, address=None):
+    """
+    link control sections into one memory image.
+    Algorithm:
+    pass 1: assign control section address(CSADDR) one after another, put section name and D symbols into ESTAB.
+    pass 2: copy T records into memory at CSADDR, relocate object code marked by relocation bits,
+            apply M records with ESTAB.
+    every T and M record is visited once, ESTAB is hashed, so loading is linear.
+    :param sections: [Record.Section] in load order.
+    :param address: load address, None for start address of first section.
+    :return: Image.
+    """
+    if address is None:
+        address = sections[0].start if len(sections) > 0 else 0
+
+    estab = {}
+    errors = []
+    csaddr = []
+    # pass 1
+    locctr = address
+    for section in sections:
+        csaddr.append(locctr)
+        if section.name in estab:
+            errors.append(section.name + ' is duplicate external symbol.')
+        else:
+            estab[section.name] = locctr
+
+        for symbol, value in section.extdef:
+            if symbol in estab:
+                errors.append(symbol + ' is duplicate external symbol.')
+            else:
+                estab[symbol] = locctr + value - section.start
+        locctr += section.length
+
+    # pass 2
+    memory = bytearray(locctr - address)
+    entry = None
+    undefined = set()
+    for section, base in zip(sections, csaddr):
+        # offset of section start address in memory.
+        offset = base - address - section.start
+        # relocation: add control section load address.
+        relocation = base - section.start
+        masks = section.masks
+        for j, (row_address, _, codes) in enumerate(section.text):
+            at = offset + row_address
+            for ob_code in codes:
+                memory[at:at + len(ob_code)] = ob_code
+                at += len(ob_code)
+
+            if masks is not None and masks[j] != 0 and relocation != 0:
+                at = offset + row_address
+                bit = 1 << len(codes) - 1
+                for ob_code in codes:
+                    if masks[j] & bit:
+                        # same field as relocation M record at object code address + 1.
+                        _modify(memory, at + 1, Record.RELOCATION[len(ob_code)], relocation)
+                    bit >>= 1
+                    at += len(ob_code)
+
+        for modify_address, half, sign, symbol in section.modify:
+            if symbol == '':
+                value = relocation
+            elif symbol in estab:
+                value = estab[symbol]
+            else:
+                if symbol not in undefined:
+                    undefined.add(symbol)
+                    errors.append(symbol + ' is undefined external symbol.')
+                continue
+
+            # M record address is relative to section start address.
+            _modify(memory, base - address + modify_address, half, value, sign)
+
+        if entry is None and section.entry is not None:
+            entry = base + section.entry - section.start
+
+    return Image(address, memory, estab, address if entry is None else entry, errors)
+
+
+def load(files, address=None):
+    """
+    read object files and link them.
+    :param files: object files in load order.
+    :param address: load address, None for start address of first section.
+    :return: Image.
+    """
+    sections = []
+    for file_name in files:
+        sections.extend(read(file_name))
+    return link(sections, address)
+
+
+def main(argv=None):
+    """
+    command line linking loader.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description='link object files into a memory image.')
+    parser.add_argument('files', nargs='+', help='object files')
+    parser.add_argument('-a', '--address', type=lambda s: int(s, 16), help='load address(hexadecimal)')
+    parser.add_argument('-o', '--output', help='write memory image into file')
+    args = parser.parse_args(argv)
+
+    image = load(args.files, args.address)
+    for symbol, value in image.estab.items():
+        print(symbol.ljust(8) + format(value, '06X'))
+    for error in image.errors:
+        print(error)
+
+    if args.output is not None:
+        with open(args.output, 'wb') as file:
+            file.write(image.memory)
+
+    return 1 if len(image.errors) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,473 @@
+import os
+import re
+import sys
+import Cache
+import Diagnostics as D
+import Include
+import Source
+
+# macro time variable or parameter, ex: &INDEV.
+VARIABLE = re.compile(r'&[A-Za-z][A-Za-z0-9]*')
+# keyword argument of invocation, ex: INDEV=F1.
+KEYWORD = re.compile(r'([A-Za-z][A-Za-z0-9]*)=(.*)$')
+# condition of IF and WHILE, ex: (&EOR NE '').
+CONDITION = re.compile(r"\(\s*(\S*)\s+(EQ|NE|LT|LE|GT|GE)\s+(\S*)\s*\)$")
+
+COMPARE = {
+    'EQ': lambda a, b: a == b,
+    'NE': lambda a, b: a != b,
+    'LT': lambda a, b: a < b,
+    'LE': lambda a, b: a <= b,
+    'GT': lambda a, b: a > b,
+    'GE': lambda a, b: a >= b,
+}
+
+# max nested invocation depth, deeper invocation is recursive macro.
+MAX_DEPTH = 64
+# max WHILE iterations of an expansion.
+MAX_LOOP = 65536
+# max memoized expansions of a definition.
+MEMO = 256
+
+
+class Definition(object):
+    """
+    a parsed macro definition.
+    name: macro name. parameters: [parameter], ex: '&INDEV'. defaults: {parameter: default value}.
+    body: rows between prototype and MEND as (symbol, operator, operand), nested definition is kept in body.
+    jumps: {body index: body index} of IF -> ELSE or ENDIF, ELSE -> ENDIF, WHILE -> ENDW, ENDW -> WHILE.
+    expansions: {arguments: expanded rows}, memoized expansion with identical arguments.
+    """
+    __slots__ = ('name', 'parameters', 'defaults', 'body', 'jumps', 'expansions')
+
+    def __init__(self, name, parameters, defaults, body, jumps):
+        self.name = name
+        self.parameters = parameters
+        self.defaults = defaults
+        self.body = body
+        self.jumps = jumps
+        self.expansions = {}
+
+    def expand(self, arguments):
+        """
+        expand body with arguments, macro time directives(SET, IF, ELSE, ENDIF, WHILE, ENDW) are evaluated here,
+        nested definition and invocation rows are left to the processor.
+        expansion depends on arguments only, so it is memoized.
+        :param arguments: tuple of argument value in parameter order.
+        :return: (tuple of (symbol, operator, operand), [(error code, token)]).
+        """
+        result = self.expansions.get(arguments)
+        if result is not None:
+            return result
+
+        variables = dict(zip(self.parameters, arguments))
+        rows = []
+        errors = []
+        body = self.body
+        jumps = self.jumps
+        # inner MACRO ... MEND depth, directives of nested definition belong to it.
+        depth = 0
+        loops = 0
+        intern = sys.intern
+        index = 0
+        while index < len(body):
+            symbol, operator, operand = body[index]
+            if depth == 0 and operator in DIRECTIVES and symbol != '.':
+                if operator == 'SET':
+                    variables[symbol] = _value(substitute(operand, variables))
+                elif operator == 'IF' or operator == 'WHILE':
+                    condition = _condition(substitute(operand, variables))
+                    if condition is None:
+                        errors.append((D.MACRO_EXPRESSION, operand))
+                    if not condition:
+                        # ELSE, ENDIF or ENDW row, skip over it.
+                        index = jumps[index]
+                elif operator == 'ELSE':
+                    # end of true part.
+                    index = jumps[index]
+                elif operator == 'ENDW':
+                    loops += 1
+                    if loops > MAX_LOOP:
+                        errors.append((D.MACRO_EXPRESSION, 'WHILE'))
+                    else:
+                        # back to WHILE.
+                        index = jumps[index] - 1
+                index += 1
+                continue
+
+            if symbol == '.':
+                # annotation.
+                pass
+            elif operator == 'MACRO':
+                depth += 1
+            elif operator == 'MEND':
+                depth -= 1
+            rows.append((intern(substitute(symbol, variables)), intern(substitute(operator, variables)),
+                         intern(substitute(operand, variables))))
+            index += 1
+
+        result = (tuple(rows), errors)
+        if len(self.expansions) < MEMO:
+            self.expansions[arguments] = result
+        return result
+
+
+# macro time directives evaluated by Definition.expand.
+DIRECTIVES = {'SET', 'IF', 'ELSE', 'ENDIF', 'WHILE', 'ENDW'}
+
+
+def substitute(text, variables):
+    """
+    replace parameters and macro time variables, -> concatenates, ex: X&ID->1 -> XA1.
+    unknown & name is kept, it may be a parameter of nested definition.
+    :param text: symbol, operator or operand.
+    :param variables: {name: value}
+    :return: string.
+    """
+    if '&' not in text:
+        return text
+    text = VARIABLE.sub(lambda match: variables.get(match.group(0), match.group(0)), text)
+    return text.replace('->', '')
+
+
+def _value(text):
+    """
+    value of SET, integer expression of + and - is computed, other text is kept.
+    :param text: substituted operand.
+    :return: string.
+    """
+    if text == '':
+        return text
+    try:
+        return str(sum(int(term) for term in re.findall(r'[+-]?[^+-]+', text)))
+    except ValueError:
+        return text
+
+
+def _condition(text):
+    """
+    evaluate condition, integers compare as integer, others as string.
+    :param text: substituted operand, ex: (3 GT 2).
+    :return: True or False, None for invalid condition.
+    """
+    match = CONDITION.match(text.strip())
+    if match is None:
+        return None
+    left, operator, right = match.groups()
+    left = '' if left == "''" else left
+    right = '' if right == "''" else right
+    try:
+        left, right = int(left), int(right)
+    except ValueError:
+        pass
+    return COMPARE[operator](left, right)
+
+
+def split_arguments(operand):
+    """
+    split invocation operand by comma outside quote, ex: C'A,B',X -> ["C'A,B'", 'X'].
+    :param operand: operand.
+    :return: [argument]
+    """
+    if "'" not in operand:
+        return operand.split(',')
+    arguments = ['']
+    quote = False
+    for c in operand:
+        if c == "'":
+            quote = not quote
+        elif c == ',' and not quote:
+            arguments.append('')
+            continue
+        arguments[-1] += c
+    return arguments
+
+
+def parse_definition(header, rows):
+    """
+    parse a definition.
+    :param header: MACRO row, symbol is macro name, operand is prototype, ex: &INDEV,&BUFADR=BUFFER.
+    :param rows: [Line] after header, MEND excluded.
+    :return: (Definition, [(error code, token)]).
+    """
+    errors = []
+    parameters = []
+    defaults = {}
+    for parameter in (header.operand.split(',') if header.operand != '' else []):
+        name, _, default = parameter.partition('=')
+        if VARIABLE.fullmatch(name) is None:
+            errors.append((D.MACRO_DEFINITION, parameter))
+            continue
+        parameters.append(name)
+        if default != '':
+            defaults[name] = default
+
+    body = tuple((line.symbol, line.operator, line.operand) for line in rows)
+    jumps = {}
+    stack = []
+    depth = 0
+    for index, (symbol, operator, operand) in enumerate(body):
+        if symbol == '.':
+            # annotation.
+            pass
+        elif operator == 'MACRO':
+            depth += 1
+        elif operator == 'MEND':
+            depth -= 1
+        elif depth > 0:
+            # directive of nested definition.
+            pass
+        elif operator == 'IF' or operator == 'WHILE':
+            stack.append(index)
+        elif operator == 'ELSE':
+            if len(stack) == 0 or body[stack[-1]][1] != 'IF':
+                errors.append((D.MACRO_DEFINITION, operator))
+                continue
+            jumps[stack.pop()] = index
+            stack.append(index)
+        elif operator == 'ENDIF' or operator == 'ENDW':
+            opener = 'WHILE' if operator == 'ENDW' else ('IF', 'ELSE')
+            if len(stack) == 0 or body[stack[-1]][1] not in opener:
+                errors.append((D.MACRO_DEFINITION, operator))
+                continue
+            start = stack.pop()
+            jumps[start] = index
+            if operator == 'ENDW':
+                jumps[index] = start
+
+    for index in reversed(stack):
+        # IF, ELSE or WHILE without end, it is ended at body end.
+        errors.append((D.MACRO_DEFINITION, body[index][1]))
+        jumps[index] = len(body)
+        if body[index][1] == 'WHILE':
+            body += (('', 'ENDW', ''),)
+            jumps[index] = len(body) - 1
+            jumps[len(body) - 1] = index
+
+    return Definition(header.symbol, parameters, defaults, body, jumps), errors
+
+
+def collect(header, rows):
+    """
+    read rows of a definition until its MEND, nested MACRO ... MEND is kept in body.
+    definition without MEND ends at END row.
+    :param header: MACRO row.
+    :param rows: iterator of Line after header.
+    :return: ([Line] of body, MEND or END Line, None when rows end first).
+    """
+    body = []
+    depth = 0
+    for line in rows:
+        if line.symbol != '.':
+            if line.operator == 'MACRO':
+                depth += 1
+            elif line.operator == 'MEND':
+                if depth == 0:
+                    return body, line
+                depth -= 1
+            elif line.operator == 'END':
+                return body, line
+        body.append(line)
+    return body, None
+
+
+def load_library(file_name):
+    """
+    load macro library once per process, it is parsed again only when file changes.
+    library: assembly code file which has definitions only.
+    definitions are shared by every processor, so their memoized expansions are shared too.
+    :param file_name: macro library file(.txt).
+    :return: ({name: Definition}, [(error code, token)]).
+    """
+    return _libraries.get(file_name)
+
+
+def _load_library(path):
+    """
+    parse macro library file.
+    :param path: macro library file(.txt).
+    :return: ({name: Definition}, [(error code, token)]).
+    """
+    definitions = {}
+    errors = []
+    rows = Source.read_code(path)
+    for line in rows:
+        if line.symbol == '.' or (line.symbol == '' and line.operator == '' and line.operand == ''):
+            continue
+        if line.operator != 'MACRO':
+            errors.append((D.MACRO_DEFINITION, line.operator))
+            continue
+        body, end = collect(line, rows)
+        definition, definition_errors = parse_definition(line, body)
+        errors += definition_errors
+        if end is None or end.operator != 'MEND':
+            errors.append((D.MACRO_DEFINITION, line.symbol))
+        definitions[definition.name] = definition
+    return definitions, errors
+
+
+# parsed macro libraries: ({name: Definition}, [(error code, token)]) of each file.
+_libraries = Cache.FileCache(_load_library)
+
+
+class MacroProcessor(object):
+    """
+    streaming macro processor in front of pass1, it resolves include rows too.
+    definition, invocation and include rows are passed on as annotation rows, so figure shows them and
+    row index of error is kept, expanded and included rows follow them.
+    label of invocation is put on the first expanded row, or on its own EQU * row.
+    $ of expanded symbol and operand is unique per expansion, ex: $LOOP -> $AALOOP.
+    """
+    def __init__(self, libraries=(), diagnostics=None, include_path=()):
+        """
+        :param libraries: macro library files(.txt).
+        :param diagnostics: Diagnostics.Diagnostics to collect errors into.
+        :param include_path: include directories searched after directory of including file.
+        definitions: {name: Definition}. names: macro names with MACRO, MEND and include directives,
+        rows whose operator is not in names pass through.
+        pending: errors which are recorded on next passed row.
+        active: include files being read, including one of them again is a cycle.
+        included: {absolute path: content digest} of include files which expansion has read, from macro bodies
+                  and libraries too, so build cache depends on the files which are really read.
+        """
+        self.__diagnostics = diagnostics if diagnostics is not None else D.Diagnostics()
+        self.__include_path = tuple(include_path)
+        self.__definitions = {}
+        self.__names = {'MACRO', 'MEND'}
+        self.__names.update(Include.DIRECTIVES)
+        self.__active = set()
+        self.included = {}
+        self.__pending = []
+        self.__unique = 0
+        for library in libraries:
+            definitions, errors = load_library(library)
+            for code, token in errors:
+                self.__diagnostics.error(None, code, token)
+            self.__definitions.update(definitions)
+        self.__names.update(self.__definitions)
+
+    def expand(self, lines, file_name=None):
+        """
+        :param lines: iterable of Line.
+        :param file_name: assembly code file of lines, include file is searched in its directory first,
+                          None for current directory.
+        :return: generator of Line, macros expanded and include files inserted.
+        """
+        pending = self.__pending
+        index = -1
+        directory = os.path.dirname(os.path.abspath(file_name)) if file_name is not None else os.getcwd()
+        for index, line in enumerate(self.__rows(iter(lines), 0, directory)):
+            if pending:
+                for code, token in pending:
+                    self.__diagnostics.error(index, code, token)
+                pending.clear()
+            yield line
+        for code, token in pending:
+            self.__diagnostics.error(index if index >= 0 else None, code, token)
+        pending.clear()
+
+    def __rows(self, rows, depth, directory):
+        names = self.__names
+        for line in rows:
+            operator = line.operator
+            if operator not in names or line.symbol == '.':
+                yield line
+            elif operator == 'MACRO':
+                body, end = collect(line, rows)
+                definition, errors = parse_definition(line, body)
+                self.__pending.extend(errors)
+                if end is None or end.operator != 'MEND':
+                    self.__pending.append((D.MACRO_DEFINITION, line.symbol))
+                self.__definitions[definition.name] = definition
+                names.add(definition.name)
+                yield _annotation(line)
+                for row in body:
+                    yield _annotation(row)
+                if end is not None:
+                    # END row is assembled.
+                    yield _annotation(end) if end.operator == 'MEND' else end
+            elif operator == 'MEND':
+                self.__pending.append((D.MACRO_DEFINITION, operator))
+                yield _annotation(line)
+            elif depth >= MAX_DEPTH:
+                self.__pending.append((D.MACRO_RECURSION, operator))
+                yield _annotation(line)
+            elif operator in self.__definitions:
+                expanded = self.__invoke(line)
+                yield _annotation(line)
+                yield from self.__rows(iter(expanded), depth + 1, directory)
+            else:
+                # include row.
+                path = Include.resolve(line.operand, directory, self.__include_path)
+                if path is None:
+                    self.__pending.append((D.INVALID_INCLUDE, line.operand))
+                elif path in self.__active:
+                    self.__pending.append((D.MACRO_RECURSION, line.operand))
+                yield _annotation(line)
+                if path is not None and path not in self.__active:
+                    self.__active.add(path)
+                    self.included[path] = Include.load(path)[0]
+                    try:
+                        yield from self.__rows(Include.lines(path), depth + 1, os.path.dirname(path))
+                    finally:
+                        self.__active.discard(path)
+
+    def __invoke(self, line):
+        """
+        :param line: invocation row.
+        :return: [Line] of expansion.
+        """
+        definition = self.__definitions[line.operator]
+        parameters = definition.parameters
+        values = dict(definition.defaults)
+        position = 0
+        for argument in (split_arguments(line.operand) if line.operand != '' else []):
+            match = KEYWORD.match(argument)
+            if match is not None and '&' + match.group(1) in parameters:
+                values['&' + match.group(1)] = match.group(2)
+            elif position < len(parameters):
+                values[parameters[position]] = argument
+                position += 1
+            else:
+                self.__pending.append((D.MACRO_ARGUMENT, argument))
+
+        rows, errors = definition.expand(tuple(values.get(parameter, '') for parameter in parameters))
+        self.__pending.extend(errors)
+
+        prefix = _prefix(self.__unique)
+        self.__unique += 1
+        lines = [Source.Line(symbol.replace('$', '$' + prefix) if '$' in symbol else symbol, operator,
+                             operand.replace('$', '$' + prefix) if '$' in operand else operand)
+                 for symbol, operator, operand in rows]
+        if line.symbol != '':
+            if len(lines) > 0 and lines[0].symbol == '':
+                lines[0].symbol = line.symbol
+            else:
+                lines.insert(0, Source.Line(line.symbol, 'EQU', '*'))
+        return lines
+
+
+def _prefix(number):
+    """
+    unique prefix of an expansion, ex: 0 -> AA, 1 -> AB, 26 -> BA, 676 -> AAA.
+    :param number: expansion number.
+    :return: string.
+    """
+    letters = ''
+    width = 2
+    while number >= 26 ** width:
+        number -= 26 ** width
+        width += 1
+    for _ in range(width):
+        number, digit = divmod(number, 26)
+        letters = chr(65 + digit) + letters
+    return letters
+
+
+def _annotation(line):
+    """
+    annotation row of a macro row, its text is put in operator column like a source annotation.
+    :param line: Line.
+    :return: Line.
+    """
+    return Source.Line('.', ' '.join(text for text in (line.symbol, line.operator, line.operand) if text != ''))
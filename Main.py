@@ -1,39 +1,269 @@
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from SICXE import SicXE
 from SIC import Sic
+import Cache
+import Diagnostics as D
+import Macro
+import OnePass
+import Optab
+import Source
 
-path = os.path.abspath('.')
-assembly_path = path + '\\assembly\\'
-obfigure_path = path + '\\obfigure\\'
-object_code_path = path + '\\object_code\\'
+path = os.path.dirname(os.path.abspath(__file__))
+assembly_path = os.path.join(path, 'assembly')
+obfigure_path = os.path.join(path, 'obfigure')
+object_code_path = os.path.join(path, 'object_code')
 
-figure21 = Sic()
-figure21.run(assembly_path + 'Figure2.1.txt', 'opcode.csv', object_code_path + 'object_code2.1.txt')
-figure21.figure(obfigure_path + 'obfigure2.1.txt')
+# textbook figures, assembled when no source is given.
+FIGURES = ['2.1', '2.5', '2.9', '2.11', '2.15']
 
-print('Figure2.1 Finish')
+# directives which only SIC/XE has.
+XE_DIRECTIVE = {'BASE', 'NOBASE', 'LTORG', 'EQU', 'ORG', 'USE', 'CSECT', 'EXTDEF', 'EXTREF'}
 
-figure25 = SicXE()
-figure25.run(assembly_path + 'Figure2.5.txt', 'opcode.csv', object_code_path + 'object_code2.5.txt')
-figure25.figure(obfigure_path + 'obfigure2.5.txt')
+# assembly code extension in directory.
+EXTENSION = ('.txt', '.asm')
+# output suffix: object code, figure.
+OBJECT_SUFFIX = '.obj.txt'
+BINARY_SUFFIX = '.obj.bin'
+FIGURE_SUFFIX = '.lst.txt'
 
-print('Figure2.5 Finish')
 
-figure29 = SicXE()
-figure29.run(assembly_path + 'Figure2.9.txt', 'opcode.csv', object_code_path + 'object_code2.9.txt')
-figure29.figure(obfigure_path + 'obfigure2.9.txt')
+def detect(code_file, op_file, libraries=(), include_path=()):
+    """
+    detect assembly code is SIC or SIC/XE, macros are expanded and include files are inserted first.
+    SIC/XE: +operator, #operand, @operand, =literal, format 1 or 2 operator or SIC/XE directive.
+    :param code_file: assembly code file(.txt)
+    :param op_file: operator file(.csv)
+    :param libraries: macro library files(.txt).
+    :param include_path: include directories.
+    :return: 'SIC' or 'SICXE'
+    """
+    operator_tab = Optab.load(op_file)
+    for line in Macro.MacroProcessor(libraries, include_path=include_path).expand(Source.read_code(code_file),
+                                                                                  code_file):
+        if line.symbol == '.':
+            # . is annotation.
+            continue
 
-print('Figure2.9 Finish')
+        operator = line.operator
+        if operator[:1] == '+' or line.operand[:1] in ('#', '@', '='):
+            return 'SICXE'
+        elif operator in XE_DIRECTIVE:
+            return 'SICXE'
+        elif operator in operator_tab and operator_tab[operator].format != Optab.Format.THREE:
+            return 'SICXE'
+        elif operator == 'END':
+            break
 
-figure211 = SicXE()
-figure211.run(assembly_path + 'Figure2.11.txt', 'opcode.csv', object_code_path + 'object_code2.11.txt')
-figure211.figure(obfigure_path + 'obfigure2.11.txt')
+    return 'SIC'
 
-print('Figure2.11 Finish')
 
-figure215 = SicXE()
-figure215.run(assembly_path + 'Figure2.15.txt', 'opcode.csv', object_code_path + 'object_code2.15.txt')
-figure215.figure(obfigure_path + 'obfigure2.15.txt')
+def unchanged(includes):
+    """
+    whether include files of a cache entry still have the content they had when it was assembled.
+    :param includes: {absolute path: content digest}
+    :return: bool
+    """
+    for path, sha in includes.items():
+        try:
+            if Cache.file_digest(path) != sha:
+                return False
+        except OSError:
+            return False
+    return True
 
-print('Figure2.15 Finish')
 
+def assemble(job):
+    """
+    assemble one assembly code file, it runs in worker process.
+    if build cache is given, file which is not changed is not assembled again,
+    SIC/XE file is cached by control section too.
+    one pass SIC/XE keeps no code, so it writes no figure file.
+    figure file is written while object code is written.
+    errors are collected per file, rows of error messages are formatted in worker process which has code.
+    :param job: (assembly code file, operator file, object code file, figure file or None, machine,
+                 Cache.BuildCache or None, whether write binary object file, whether assemble SIC/XE in one pass,
+                 macro library files, include directories, whether coalesce SIC/XE T records by final address,
+                 whether write relocation bits)
+    :return: (assembly code file, machine, seconds, error message, [assembler error message], error count)
+    """
+    (code_file, op_file, ob_file, figure_file, machine, cache, binary, one_pass, libraries, include_path, coalesce,
+     relocation_bits) = job
+    mode = 'b' if binary else ''
+    begin = time.perf_counter()
+    diagnostics = D.Diagnostics()
+    assembler = None
+    try:
+        key = None
+        if cache is not None:
+            # key: assembler version, operator table, machine option, source content, macro libraries,
+            # include directories. include files are known after expansion, entry keeps them.
+            key = Cache.digest(Cache.VERSION, Optab.digest(op_file), machine, mode, str(one_pass),
+                               str(figure_file is None), str(coalesce), str(relocation_bits),
+                               Cache.file_digest(code_file), *[Cache.file_digest(name) for name in libraries],
+                               *[os.path.abspath(directory) for directory in include_path])
+            result = cache.get(key)
+            if result is not None and not unchanged(result[5]):
+                result = None
+            if result is not None:
+                # error messages are replayed, so a file with errors is not reported as clean.
+                machine, object_text, figure_text, messages, count, _ = result
+                with open(ob_file, 'w' + mode) as file:
+                    file.write(object_text)
+                if figure_text is not None:
+                    with open(figure_file, 'w') as file:
+                        file.write(figure_text)
+                return code_file, machine + '*', time.perf_counter() - begin, '', messages, count
+
+        if machine == 'auto':
+            machine = detect(code_file, op_file, libraries, include_path)
+
+        if machine == 'SIC':
+            assembler = Sic()
+            assembler.run(code_file, op_file, ob_file, binary=binary, diagnostics=diagnostics,
+                          figure_file=figure_file, libraries=libraries, include_path=include_path,
+                          relocation_bits=relocation_bits)
+        elif one_pass:
+            # one pass assembler keeps rows of errors for report.
+            assembler = OnePass.OnePass()
+            assembler.run(code_file, op_file, ob_file, binary=binary, diagnostics=diagnostics, libraries=libraries,
+                          include_path=include_path)
+        else:
+            assembler = SicXE()
+            assembler.run(code_file, op_file, ob_file, cache=cache, binary=binary, diagnostics=diagnostics,
+                          figure_file=figure_file, libraries=libraries, include_path=include_path,
+                          coalesce=coalesce, relocation_bits=relocation_bits)
+
+        messages = list(diagnostics.messages(assembler.row))
+        if key is not None:
+            with open(ob_file, 'r' + mode) as file:
+                object_text = file.read()
+            figure_text = None
+            if figure_file is not None and (machine == 'SIC' or not one_pass):
+                with open(figure_file, 'r') as file:
+                    figure_text = file.read()
+            cache.put(key, (machine, object_text, figure_text, messages, diagnostics.count,
+                            dict(assembler.includes)))
+        error = ''
+    except Exception as e:
+        error = type(e).__name__ + ': ' + str(e)
+        messages = list(diagnostics.messages(assembler.row)) if assembler is not None else []
+
+    return code_file, machine, time.perf_counter() - begin, error, messages, diagnostics.count
+
+
+def outputs(code_file, binary=False):
+    """
+    object code file and figure file next to assembly code file.
+    ex: dir/Figure2.1.txt -> dir/Figure2.1.obj.txt(dir/Figure2.1.obj.bin for binary), dir/Figure2.1.lst.txt
+    :param code_file: assembly code file.
+    :param binary: whether object code file is binary.
+    :return: (object code file, figure file)
+    """
+    base = os.path.splitext(code_file)[0]
+    return base + (BINARY_SUFFIX if binary else OBJECT_SUFFIX), base + FIGURE_SUFFIX
+
+
+def collect(sources, manifest):
+    """
+    collect assembly code files from files, directories and manifest.
+    manifest: one assembly code file per row, relative to manifest directory, # for annotation.
+    :param sources: list of file or directory.
+    :param manifest: manifest file or None.
+    :return: list of assembly code file.
+    """
+    files = []
+    if manifest is not None:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r') as file:
+            for row in file:
+                row = row.strip()
+                if row != '' and row[0] != '#':
+                    sources.append(os.path.join(base, row))
+
+    for source in sources:
+        if os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.endswith(EXTENSION) and not name.endswith((OBJECT_SUFFIX, BINARY_SUFFIX, FIGURE_SUFFIX)):
+                    files.append(os.path.join(source, name))
+        else:
+            files.append(source)
+
+    return files
+
+
+def main(argv=None):
+    """
+    command line entry.
+    :param argv: arguments, None for sys.argv.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description='SIC and SIC/XE assembler.')
+    parser.add_argument('sources', nargs='*', help='assembly code files or directories')
+    parser.add_argument('-m', '--manifest', help='file which lists assembly code files')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('-o', '--optab', default=os.path.join(path, 'opcode.csv'), help='operator file(.csv)')
+    parser.add_argument('--machine', choices=['auto', 'SIC', 'SICXE'], default='auto', help='assembler')
+    parser.add_argument('--binary', action='store_true', help='write binary object file')
+    parser.add_argument('--one-pass', action='store_true', help='assemble SIC/XE in one pass, no figure file')
+    parser.add_argument('--coalesce', action='store_true',
+                        help='pack SIC/XE T records by final address, USE blocks do not fragment them')
+    parser.add_argument('--relocation-bits', action='store_true',
+                        help='write relocation bit masks in T records instead of relocation M records')
+    parser.add_argument('--no-figure', action='store_true', help='write no figure file')
+    parser.add_argument('-I', '--include-dir', action='append', default=[], help='include directory, can be repeated')
+    parser.add_argument('--macro-lib', action='append', default=[], help='macro library file, can be repeated')
+    parser.add_argument('--cache', help='build cache directory, unchanged file is not assembled again')
+    parser.add_argument('--cache-size', type=int, default=64, help='max build cache size(MB)')
+    args = parser.parse_args(argv)
+    cache = Cache.BuildCache(args.cache, args.cache_size << 20) if args.cache is not None else None
+
+    jobs = []
+    if len(args.sources) == 0 and args.manifest is None:
+        # textbook figures.
+        for figure in FIGURES:
+            jobs.append((os.path.join(assembly_path, 'Figure' + figure + '.txt'), args.optab,
+                         os.path.join(object_code_path, 'object_code' + figure + ('.bin' if args.binary else '.txt')),
+                         None if args.no_figure else os.path.join(obfigure_path, 'obfigure' + figure + '.txt'),
+                         args.machine, cache, args.binary, args.one_pass, args.macro_lib, args.include_dir,
+                         args.coalesce, args.relocation_bits))
+    else:
+        for code_file in collect(list(args.sources), args.manifest):
+            ob_file, figure_file = outputs(code_file, args.binary)
+            jobs.append((code_file, args.optab, ob_file, None if args.no_figure else figure_file,
+                         args.machine, cache, args.binary, args.one_pass, args.macro_lib, args.include_dir,
+                         args.coalesce, args.relocation_bits))
+
+    begin = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        results = list(executor.map(assemble, jobs))
+    wall = time.perf_counter() - begin
+
+    failed = 0
+    errors = 0
+    width = max([len(result[0]) for result in results] + [4])
+    # * for result from build cache.
+    print('file'.ljust(width) + '  machine  errors  time(s)')
+    for code_file, machine, seconds, error, _, count in results:
+        print(code_file.ljust(width) + '  ' + machine.ljust(7) + '  ' + str(count).rjust(6) + '  ' +
+              format(seconds, '.4f') + ('  ' + error if error != '' else ''))
+        if error != '':
+            failed += 1
+        errors += count
+
+    # assembler errors of each file, in file order.
+    for code_file, _, _, _, messages, _ in results:
+        for message in messages:
+            print(code_file + ': ' + message)
+
+    print(str(len(results)) + ' files, ' + str(failed) + ' failed, ' + str(errors) + ' errors, ' +
+          format(sum(r[2] for r in results), '.4f') + ' s total, ' + format(wall, '.4f') + ' s wall, ' +
+          str(args.jobs) + ' workers')
+    return 1 if failed > 0 or errors > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,541 @@
+import io
+import shutil
+import tempfile
+import Arithmetic as A
+import Binary
+import Diagnostics as D
+import Macro
+import Optab
+import Record
+import Source
+
+# spooled records stay in memory up to this size(byte), then move into temporary file.
+SPOOL_SIZE = 1 << 20
+
+
+class Fixup(object):
+    """
+    object code which waits for a symbol.
+    address: object code address.
+    word: True for WORD expression, False for format 3 or 4 instruction.
+    operand: symbol, literal('=' + ascii code) or WORD expression.
+    target: operand address after it is defined.
+    opcode: opcode + n * 2 + i.
+    x, e: x and e bits.
+    immediate: whether n=0 i=1.
+    pc: program counter of instruction.
+    base: base register value, or symbol name when BASE symbol was not defined yet.
+    index, line: source row index and Line for error message.
+    """
+    __slots__ = ('address', 'word', 'operand', 'target', 'opcode', 'x', 'e', 'immediate', 'pc', 'base', 'index',
+                 'line')
+
+    def __init__(self, address, word, operand, index, line, opcode=0, x=0, e=0, immediate=False, pc=0, base=0):
+        self.address = address
+        self.word = word
+        self.operand = operand
+        self.target = None
+        self.opcode = opcode
+        self.x = x
+        self.e = e
+        self.immediate = immediate
+        self.pc = pc
+        self.base = base
+        self.index = index
+        self.line = line
+
+
+class OnePass(object):
+    """
+    one pass SIC/XE assembler, object code is written while rows are read, rows are not kept.
+    forward reference gets placeholder object code and a fixup in fixup table,
+    fixup is patched when its symbol is defined: in place if its T record is not written yet,
+    otherwise by an extra T record after it, which overwrites placeholder when loader loads it.
+    T and M records are spooled until control section end, then written after H, D and R records.
+    memory is proportional to symbols and unresolved fixups, not to program size.
+    USE block is not supported, EQU and ORG operand can not contain forward reference,
+    a literal refers to the next literal pool(LTORG or section end) after it.
+    """
+    def __init__(self):
+        """
+        operator table: {operator: Operator(opcode, format)}, shared by all instances.
+        symbol table: {symbol: [address, block]} of defined symbols, block is always 0, Arithmetic reads it.
+        fixup table: {name: [Fixup]} of object code which waits for name, name is an undefined symbol,
+                     '=' + hex of a literal which waits for its pool, or BASE symbol which is not defined yet.
+                     fixups of a name are patched and removed when it is defined.
+        literal table: {ascii code: operand} literals which wait for next literal pool.
+        extdef: [external definition]
+        extref: [external reference]
+        base: base register value, or symbol name which is not defined yet.
+        row: T record being filled [start address, length, [object code], {address: object code index}],
+             index lets a fixup patch its placeholder in place.
+        text: spooled T records. modify: spooled M records.
+        name, start address, locctr, length: H record fields and location counter of current control section.
+        entry: address of first object code of current control section. main: whether it is main program.
+        diagnostics: Diagnostics.Diagnostics which collects errors.
+        rows: {row index: (Line, location)} of rows which have kept error records, for report.
+        index: current source row index.
+        includes: {absolute path: content digest} of include files read while rows are read.
+        """
+        self.__operator_tab = {}
+        self.__symbol_tab = {}
+        self.__fixup_tab = {}
+        self.__literal_tab = {}
+        self.__extdef = []
+        self.__extref = []
+        self.__base = 0
+        self.__row = None
+        self.__text = None
+        self.__modify = None
+        self.__name = ''
+        self.__start_address = 0
+        self.__locctr = 0
+        self.__length = 0
+        self.__entry = None
+        self.__main = True
+        self.__diagnostics = D.Diagnostics()
+        self.__rows = {}
+        self.__index = 0
+        self.includes = {}
+
+    def run(self, code_file, op_file, ob_file, use_mmap=False, binary=False, diagnostics=None, libraries=(),
+            include_path=()):
+        """
+        assemble code in one pass and generate object code.
+        :param code_file: assembly code file(.txt)
+        :param op_file: operator file(.csv)
+        :param ob_file: object code file(.txt) or file-like object.
+        :param use_mmap: whether read assembly code file through mmap.
+        :param binary: whether write binary object file, text records are converted at end.
+        :param diagnostics: Diagnostics.Diagnostics to collect errors into, None for write errors to stdout
+                            after run. row index is source row index.
+        :param libraries: macro library files(.txt).
+        :param include_path: include directories searched after directory of assembly code file.
+        """
+        self.__operator_tab = Optab.load(op_file)
+        self.__diagnostics = diagnostics if diagnostics is not None else D.Diagnostics()
+        if binary:
+            out = io.StringIO()
+        elif isinstance(ob_file, str):
+            out = open(ob_file, 'w')
+        else:
+            out = ob_file
+
+        try:
+            processor = Macro.MacroProcessor(libraries, self.__diagnostics, include_path)
+            self.includes = processor.included
+            self.__assemble(processor.expand(Source.read_code(code_file, use_mmap), code_file), out)
+        finally:
+            if out is not ob_file and not binary:
+                out.close()
+            if diagnostics is None:
+                self.__diagnostics.report(self.row)
+
+        if binary:
+            dialect, sections = Record.parse(out.getvalue())
+            with Binary.writer(ob_file, dialect, True) as writer:
+                for section in sections:
+                    writer.write(section)
+
+    def __assemble(self, source, out):
+        """
+        :param source: generator of Line.
+        :param out: text file-like object.
+        """
+        first = True
+        for self.__index, line in enumerate(source):
+            if line.symbol == '.':
+                # . is annotation.
+                continue
+            elif line.symbol == '' and line.operator == '' and line.operand == '':
+                # blank line.
+                continue
+
+            if first:
+                first = False
+                if line.operator == 'START':
+                    # START operand is begin address, START symbol is program name.
+                    self.__begin(line.symbol, int(line.operand, 16), True)
+                    continue
+                self.__begin('', 0, True)
+
+            if line.operator == 'END':
+                break
+            elif line.operator == 'CSECT':
+                self.__finish(out)
+                self.__begin(line.symbol, 0, False)
+            else:
+                self.__line(line)
+        else:
+            self.__diagnostics.error(None, D.MISSING_END, 'END')
+
+        if not first:
+            self.__finish(out)
+
+    def __begin(self, name, start, main):
+        """
+        start a control section.
+        :param name: section name.
+        :param start: start address.
+        :param main: whether this section is main program.
+        """
+        self.__name = name
+        self.__start_address = start
+        self.__locctr = start
+        self.__length = 0
+        self.__base = start
+        self.__entry = None
+        self.__main = main
+        self.__text = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+')
+        self.__modify = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+')
+
+    def __finish(self, out):
+        """
+        end a control section: place literals, report undefined symbols and write its object program.
+        :param out: text file-like object.
+        """
+        self.__place_literals()
+        self.__flush()
+
+        for symbol, fixups in self.__fixup_tab.items():
+            for fixup in fixups:
+                self.__error(D.UNDEFINED_SYMBOL, symbol, fixup)
+
+        extdef = []
+        for symbol in self.__extdef:
+            if symbol in self.__symbol_tab:
+                extdef.append((symbol, self.__symbol_tab[symbol][0]))
+            else:
+                self.__diagnostics.error(None, D.UNDEFINED_SYMBOL, symbol)
+
+        # main program End: first executable instruction address, start address when there is no object code,
+        # control section End: no address.
+        entry = None
+        if self.__main:
+            entry = self.__entry if self.__entry is not None else self.__start_address
+        section = Record.Section(self.__name, self.__start_address, self.__length, extdef, self.__extref,
+                                 entry=entry)
+        out.write(Record.head(section))
+        for spool in (self.__text, self.__modify):
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+            spool.close()
+        out.write(Record.end(section))
+
+        self.__symbol_tab.clear()
+        self.__fixup_tab.clear()
+        self.__literal_tab.clear()
+        self.__extdef = []
+        self.__extref = []
+
+    def row(self, index):
+        """
+        a source row which has error record.
+        :param index: source row index.
+        :return: string (location symbol operator operand), '' for annotation row of macro error.
+        """
+        if index not in self.__rows:
+            return ''
+        line, loc = self.__rows[index]
+        return A.output_hex(loc, 4).ljust(7) + line.symbol.ljust(15) + line.operator.ljust(15) + \
+            line.operand.ljust(15)
+
+    def __error(self, code, token='', fixup=None, line=None):
+        """
+        record an error of current row or of a fixup, row is kept for report only if its record is kept.
+        :param code: Diagnostics error code.
+        :param token: symbol, operator or operand which caused error.
+        :param fixup: Fixup, None for current row.
+        :param line: current row Line.
+        """
+        if fixup is not None:
+            index, row = fixup.index, (fixup.line, fixup.address)
+        else:
+            index, row = self.__index, (line, self.__locctr)
+        kept = len(self.__diagnostics.records)
+        try:
+            self.__diagnostics.error(index, code, token)
+        finally:
+            if len(self.__diagnostics.records) > kept:
+                self.__rows[index] = row
+
+    def __line(self, line):
+        """
+        assemble a row.
+        :param line: Line.
+        """
+        Source.lex(line, self.__operator_tab)
+        symbol = line.symbol
+        operator = line.operator
+        operand = line.operand
+        entry = line.entry
+
+        if symbol != '' and operator != 'EQU':
+            # EQU defines its symbol by operand value.
+            if symbol in self.__symbol_tab:
+                self.__error(D.DUPLICATE_SYMBOL, symbol, line=line)
+            else:
+                self.__define(symbol, self.__locctr)
+
+        if entry is not None:
+            if entry.format == Optab.Format.ONE:
+                self.__emit(self.__locctr, bytes((entry.opcode,)))
+                self.__advance(1)
+            elif entry.format == Optab.Format.TWO:
+                self.__emit(self.__locctr, bytes((entry.opcode, self.__registers(line))))
+                self.__advance(2)
+            else:
+                self.__advance(3 + line.extend)
+                self.__instruction(line, entry.opcode)
+        elif operator == 'WORD':
+            fixup = Fixup(self.__locctr, True, operand, self.__index, line)
+            self.__emit(fixup.address, bytes(3))
+            self.__advance(3)
+            self.__resolve(fixup)
+        elif operator == 'BYTE':
+            self.__emit(self.__locctr, line.data)
+            self.__advance(len(line.data))
+        elif operator == 'RESW':
+            self.__advance(int(operand) * 3)
+        elif operator == 'RESB':
+            self.__advance(int(operand))
+        elif operator == 'LTORG':
+            self.__place_literals()
+        elif operator == 'EQU':
+            if operand == '*':
+                value = self.__locctr
+            else:
+                value = self.__expression(line, True)
+            if value is not None and symbol != '':
+                self.__define(symbol, value)
+        elif operator == 'ORG':
+            value = self.__expression(line, False)
+            if value is not None:
+                # change Locctr temporarily.
+                self.__locctr = value
+        elif operator == 'BASE':
+            if operand == '*':
+                self.__base = self.__locctr
+            else:
+                # symbol which is not defined yet is resolved when a fixup needs it.
+                self.__base = self.__symbol_tab[operand][0] if operand in self.__symbol_tab else operand
+        elif operator == 'NOBASE':
+            self.__base = 0
+        elif operator == 'EXTDEF':
+            self.__extdef.extend(operand.split(','))
+        elif operator == 'EXTREF':
+            self.__extref = operand.split(',')
+        elif operator == 'USE':
+            self.__error(D.UNSUPPORTED, operator, line=line)
+        else:
+            self.__error(D.INVALID_OPERATOR, operator, line=line)
+
+    def __advance(self, size):
+        """
+        :param size: bytes of this row.
+        """
+        self.__locctr += size
+        self.__length += size
+
+    def __registers(self, line):
+        """
+        :param line: lexed Line of format 2.
+        :return: register1(4 bits)|register2(4 bits), invalid register is 0.
+        """
+        if line.value is None:
+            self.__error(D.INVALID_OPERAND, line.operand, line=line)
+            return 0
+
+        for register in line.target:
+            self.__error(D.INVALID_REGISTER, register, line=line)
+        return line.value
+
+    def __instruction(self, line, opcode):
+        """
+        format 3 or 4 instruction, location counter is already after it.
+        :param line: lexed Line.
+        :param opcode: opcode.
+        """
+        operand = line.target
+        e = line.extend
+        address = self.__locctr - 3 - e
+
+        fixup = Fixup(address, False, operand, self.__index, line, opcode + line.mode, line.index, e,
+                      line.mode == Source.IMMEDIATE, self.__locctr, self.__base)
+        is_address = True
+        if line.kind == Source.NO_OPERAND:
+            is_address = False
+            fixup.target = 0
+        elif line.kind == Source.LITERAL:
+            # literal is placed by next LTORG or section end.
+            self.__literal_tab.setdefault(line.data, operand)
+            fixup.operand = '=' + line.data.hex()
+        elif operand in self.__symbol_tab:
+            fixup.target = self.__symbol_tab[operand][0]
+        elif operand in self.__extref:
+            fixup.target = 0
+        elif line.kind == Source.INTEGER:
+            fixup.target = line.value
+            is_address = False
+
+        if e == 1 and not fixup.immediate and is_address:
+            # if operand is external reference then modify + operand, otherwise relocation.
+            if operand in self.__extref:
+                self.__modify.write(Record.modify_row((address - self.__start_address + 1, 5, '+', operand)))
+            else:
+                self.__modify.write(Record.modify_row((address - self.__start_address + 1, 5, '', '')))
+
+        if not is_address:
+            # immediate integer or no operand, no displacement.
+            self.__emit(address, self.__encode_instruction(fixup, fixup.target, True))
+        else:
+            self.__emit(address, A.instruction(fixup.opcode, fixup.x * 8 + e, 0, e))
+            self.__resolve(fixup)
+
+    def __encode_instruction(self, fixup, target, absolute=False):
+        """
+        :param fixup: Fixup of instruction.
+        :param target: operand address or integer.
+        :param absolute: whether target is integer, not address.
+        :return: object code, or None if base register symbol is not defined yet.
+        """
+        b, p = 0, 0
+        if fixup.e == 0 and not absolute:
+            if -2048 <= target - fixup.pc <= 2047:
+                # PC relative.
+                p = 1
+                target = target - fixup.pc
+            else:
+                base = fixup.base
+                if isinstance(base, str):
+                    if base not in self.__symbol_tab:
+                        return None
+                    base = self.__symbol_tab[base][0]
+                if 0 <= target - base <= 4095:
+                    # BASE relative.
+                    b = 1
+                    target = target - base
+                elif not fixup.immediate:
+                    self.__error(D.FORMAT_THREE, fixup=fixup)
+
+        return A.instruction(fixup.opcode, fixup.x * 8 + b * 4 + p * 2 + fixup.e, target, fixup.e)
+
+    def __resolve(self, fixup):
+        """
+        patch object code of fixup, or wait for the symbol it needs.
+        :param fixup: Fixup.
+        """
+        if fixup.word:
+            for name, _, value in A.compile_expression(fixup.operand)[0]:
+                if value is None and name not in self.__symbol_tab and name not in self.__extref:
+                    self.__fixup_tab.setdefault(name, []).append(fixup)
+                    return
+
+            value = A.expression(self.__symbol_tab, self.__extref, fixup.operand)
+            # external reference in WORD need modify record at this word.
+            for modify in A.modification(value.external, fixup.address - self.__start_address):
+                self.__modify.write(Record.modify_row(modify))
+            if not value.error:
+                self.__patch(fixup.address, A.encode(value.value, 3))
+            return
+
+        if fixup.target is None:
+            if fixup.operand not in self.__symbol_tab:
+                self.__fixup_tab.setdefault(fixup.operand, []).append(fixup)
+                return
+            fixup.target = self.__symbol_tab[fixup.operand][0]
+
+        code = self.__encode_instruction(fixup, fixup.target)
+        if code is None:
+            # wait for BASE symbol.
+            self.__fixup_tab.setdefault(fixup.base, []).append(fixup)
+        else:
+            self.__patch(fixup.address, code)
+
+    def __define(self, symbol, value):
+        """
+        define symbol and patch fixups which wait for it.
+        :param symbol: symbol.
+        :param value: address or absolute value.
+        """
+        self.__symbol_tab[symbol] = [value, 0]
+        for fixup in self.__fixup_tab.pop(symbol, ()):
+            self.__resolve(fixup)
+
+    def __expression(self, line, equ):
+        """
+        value of EQU or ORG operand, every symbol in it must be defined already.
+        :param line: Line.
+        :param equ: True for EQU, only relative or absolute expression is valid.
+        :return: value, None for error expression.
+        """
+        operand = line.operand
+        if equ and (operand.find('*') >= 0 or operand.find('/') >= 0):
+            self.__error(D.ERROR_EXPRESSION, operand, line=line)
+            return None
+
+        for name, _, value in A.compile_expression(operand)[0]:
+            if value is None and name not in self.__symbol_tab and name not in self.__extref:
+                self.__error(D.FORWARD_REFERENCE, name, line=line)
+                return None
+
+        value = A.expression(self.__symbol_tab, self.__extref, operand)
+        for modify in A.modification(value.external, 0):
+            self.__modify.write(Record.modify_row(modify))
+
+        if value.error or (equ and not (value.plus == 1 and value.minus == 0) and value.plus != value.minus):
+            self.__error(D.ERROR_EXPRESSION, operand, line=line)
+            return None
+        return value.value
+
+    def __place_literals(self):
+        """
+        put literals which wait for pool at location counter and patch their fixups.
+        """
+        for key in self.__literal_tab:
+            address = self.__locctr
+            self.__advance(len(key))
+            self.__emit(address, key)
+            for fixup in self.__fixup_tab.pop('=' + key.hex(), ()):
+                fixup.target = address
+                self.__resolve(fixup)
+        self.__literal_tab.clear()
+
+    def __emit(self, address, code):
+        """
+        append object code into T record being filled, a new T record starts when address is not continuous
+        or it is over 30 bytes.
+        :param address: object code address.
+        :param code: object code(bytes).
+        """
+        size = len(code)
+        row = self.__row
+        if row is None or row[0] + row[1] != address or row[1] + size > Record.TLENGTH:
+            self.__flush()
+            row = self.__row = [address, 0, [], {}]
+        row[3][address] = len(row[2])
+        row[2].append(code)
+        row[1] += size
+        if self.__entry is None:
+            self.__entry = address
+
+    def __flush(self):
+        """
+        write T record being filled into spool.
+        """
+        if self.__row is not None:
+            self.__text.write(Record.text_row(self.__row[0], self.__row[1], self.__row[2]))
+            self.__row = None
+
+    def __patch(self, address, code):
+        """
+        replace placeholder object code.
+        :param address: object code address.
+        :param code: object code(bytes).
+        """
+        row = self.__row
+        if row is not None and address in row[3]:
+            row[2][row[3][address]] = code
+        else:
+            # T record is written already, a later T record overwrites it.
+            self.__text.write(Record.text_row(address, len(code), [code]))
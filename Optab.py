@@ -0,0 +1,103 @@
+import csv
+import enum
+import hashlib
+import pickle
+from collections import namedtuple
+from types import MappingProxyType
+import Cache
+
+
+class Format(enum.IntEnum):
+    """
+    instruction format, format 4 is format 3 with +.
+    value is instruction length(byte).
+    """
+    ONE = 1
+    TWO = 2
+    THREE = 3
+
+
+# operator table entry: opcode(int), format(Format).
+Operator = namedtuple('Operator', ['opcode', 'format'])
+
+
+def load(file_name, cache_file=None):
+    """
+    load operator table once per process.
+    table is immutable, so every assembler instance and thread can share it.
+    ex: ADD,18,3 -> {'ADD': Operator(opcode=0x18, format=Format.THREE)}
+    :param file_name: operator table file(.csv).
+    :param cache_file: pre-serialized table file, used when its hash matches operator table file.
+    :return: {operator: Operator} (read only).
+    """
+    return _tables.get(file_name, cache_file)[1]
+
+
+def digest(file_name):
+    """
+    hash of operator table file.
+    :param file_name: operator table file(.csv).
+    :return: sha256 hexadecimal string.
+    """
+    return _tables.get(file_name)[0]
+
+
+def _load(path, cache_file=None):
+    """
+    load operator table file.
+    :param path: operator table file(.csv).
+    :param cache_file: pre-serialized table file.
+    :return: (digest, table)
+    """
+    with open(path, 'rb') as file:
+        content = file.read()
+    sha = hashlib.sha256(content).hexdigest()
+    return sha, MappingProxyType(_read_cache(cache_file, sha) or _parse(content, cache_file, sha))
+
+
+# loaded operator tables: (digest, table) of each file, shared by every assembler and thread.
+_tables = Cache.FileCache(_load)
+
+
+def _parse(content, cache_file, sha):
+    """
+    parse operator table and write pre-serialized table.
+    :param content: operator table file content(bytes).
+    :param cache_file: pre-serialized table file, None for not write.
+    :param sha: hash of operator table file.
+    :return: {operator: Operator}
+    """
+    op = csv.reader(content.decode().splitlines())
+    table = {key: Operator(int(opcode, 16), Format(int(format_))) for key, opcode, format_ in op}
+
+    if cache_file is not None:
+        try:
+            with open(cache_file, 'wb') as file:
+                pickle.dump((sha, {key: tuple(value) for key, value in table.items()}), file)
+        except OSError:
+            # cache is optional, table is still usable.
+            pass
+
+    return table
+
+
+def _read_cache(cache_file, sha):
+    """
+    read pre-serialized table.
+    :param cache_file: pre-serialized table file.
+    :param sha: hash of operator table file.
+    :return: {operator: Operator}, None if cache is missing or stale.
+    """
+    if cache_file is None:
+        return None
+
+    try:
+        with open(cache_file, 'rb') as file:
+            cache_sha, table = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+    if cache_sha != sha:
+        return None
+
+    return {key: Operator(opcode, Format(format_)) for key, (opcode, format_) in table.items()}
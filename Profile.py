@@ -0,0 +1,133 @@
+import json
+import time
+import tracemalloc
+
+
+class Timing(object):
+    """
+    time of a phase, summed over every call.
+    wall: wall clock seconds.
+    cpu: process cpu seconds.
+    calls: how many times phase ran.
+    """
+    __slots__ = ('wall', 'cpu', 'calls')
+
+    def __init__(self, wall=0.0, cpu=0.0, calls=0):
+        self.wall = wall
+        self.cpu = cpu
+        self.calls = calls
+
+
+class Profile(object):
+    """
+    instrumentation of an assembler run.
+    phases: {phase: Timing}, phase is load_code, load_optab, pass1, pass2, object_code, figure.
+    counters: {counter: count}, counter is symbol_lookups, expressions, literals, m_records, t_records.
+    memory: {phase: (current, peak)} traced memory(byte) after phase, only when memory is True.
+    assembler keeps None instead of Profile when instrumentation is disabled, so disabled cost is a None check
+    per phase and per pass.
+    """
+    def __init__(self, memory=False):
+        """
+        :param memory: whether trace memory of every phase with tracemalloc.
+        """
+        self.phases = {}
+        self.counters = {}
+        self.memory = {}
+        self.trace_memory = memory
+
+    def phase(self, name):
+        """
+        time a phase.
+        ex: with profile.phase('pass1'): ...
+        :param name: phase name.
+        :return: context manager.
+        """
+        return _Phase(self, name)
+
+    def count(self, name, n=1):
+        """
+        add into counter.
+        :param name: counter name.
+        :param n: quantity.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        """
+        :return: {'phases': {phase: {'wall', 'cpu', 'calls'}}, 'counters': {...}, 'memory': {phase: {...}}}
+        """
+        return {
+            'phases': {name: {'wall': t.wall, 'cpu': t.cpu, 'calls': t.calls} for name, t in self.phases.items()},
+            'counters': dict(self.counters),
+            'memory': {name: {'current': current, 'peak': peak} for name, (current, peak) in self.memory.items()},
+        }
+
+    def to_json(self, indent=None):
+        """
+        :param indent: json indent.
+        :return: json string of as_dict.
+        """
+        return json.dumps(self.as_dict(), indent=indent)
+
+
+class _Phase(object):
+    def __init__(self, profile, name):
+        self.__profile = profile
+        self.__name = name
+        self.__wall = 0.0
+        self.__cpu = 0.0
+        self.__started = False
+
+    def __enter__(self):
+        if self.__profile.trace_memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self.__started = True
+        self.__wall = time.perf_counter()
+        self.__cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.__wall
+        cpu = time.process_time() - self.__cpu
+        timing = self.__profile.phases.get(self.__name)
+        if timing is None:
+            timing = self.__profile.phases[self.__name] = Timing()
+        timing.wall += wall
+        timing.cpu += cpu
+        timing.calls += 1
+
+        if self.__profile.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.__name in self.__profile.memory:
+                peak = max(peak, self.__profile.memory[self.__name][1])
+            self.__profile.memory[self.__name] = (current, peak)
+            if self.__started:
+                tracemalloc.stop()
+
+
+class _Null(object):
+    """
+    context manager which does nothing, phase of disabled instrumentation.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL = _Null()
+
+
+def phase(profile, name):
+    """
+    time a phase if instrumentation is enabled.
+    :param profile: Profile or None.
+    :param name: phase name.
+    :return: context manager.
+    """
+    return NULL if profile is None else profile.phase(name)
@@ -0,0 +1,304 @@
+import Arithmetic as A
+
+# object code dialect.
+SIC = 'SIC'
+SICXE = 'SICXE'
+
+# max T record length(byte), 60 columns hexadecimal.
+TLENGTH = 30
+
+# relocation bit: object code length -> relocated half bytes at its end, SIC address(x bit and 15 bits) and
+# format 4 address(20 bits), the same field as relocation M record at object code address + 1.
+RELOCATION = {3: 4, 4: 5}
+
+
+class Section(object):
+    """
+    object program of a control section.
+    extdef structure: [(symbol, address)]
+    extref structure: [symbol]
+    text structure: [[row start address, row length, [object code]]], object code is bytes-like.
+    modify structure: [(address, length(half byte), sign, symbol)], sign and symbol are '' for relocation.
+    entry: first executable instruction address, None for no address in E record.
+    masks: [relocation bit mask] of each T record, None when relocation is written as M records.
+           a mask has one bit per object code, first object code is the highest bit.
+    """
+    __slots__ = ('name', 'start', 'length', 'extdef', 'extref', 'text', 'modify', 'entry', 'masks')
+
+    def __init__(self, name='', start=0, length=0, extdef=None, extref=None, text=None, modify=None, entry=None,
+                 masks=None):
+        self.name = name
+        self.start = start
+        self.length = length
+        self.extdef = extdef if extdef is not None else []
+        self.extref = extref if extref is not None else []
+        self.text = text if text is not None else []
+        self.modify = modify if modify is not None else []
+        self.entry = entry
+        self.masks = masks
+
+
+def pack(items, limit=TLENGTH):
+    """
+    pack object code into T records.
+    Algorithm:
+    for item in items
+        if item need new row or row length + item length > limit
+            text next row
+        append item into last row
+    :param items: iterable of (address, object code(bytes), whether start new row).
+    :param limit: max row length(byte).
+    :return: [[row start address, row length, [object code]]]
+    """
+    text = []
+    for address, ob_code, new in items:
+        size = len(ob_code)
+        if new or len(text) == 0 or text[-1][1] + size > limit:
+            text.append([address, size, [ob_code]])
+        else:
+            text[-1][1] += size
+            text[-1][2].append(ob_code)
+    return text
+
+
+def relocation_bits(section):
+    """
+    move relocation M records into relocation bit masks of T records, SIC style.
+    relocation M record which does not match RELOCATION field of an object code stays M record,
+    external reference M records are compacted. section without relocated object code keeps no masks.
+    :param section: Section, masks and modify are replaced.
+    :return: section.
+    """
+    relocation = set()
+    external = []
+    for modify in section.modify:
+        if modify[3] == '':
+            # (address, length) of relocated field.
+            relocation.add(modify[:2])
+        else:
+            external.append(modify)
+
+    masks = []
+    for address, _, codes in section.text:
+        mask = 0
+        # M record address is relative to start address.
+        at = address - section.start + 1
+        for ob_code in codes:
+            mask <<= 1
+            field = (at, RELOCATION.get(len(ob_code)))
+            if field in relocation:
+                relocation.discard(field)
+                mask |= 1
+            at += len(ob_code)
+        masks.append(mask)
+
+    section.masks = masks if any(masks) else None
+    section.modify = sorted([(address, half, '', '') for address, half in relocation] + compact(external),
+                            key=lambda modify: modify[0])
+    return section
+
+
+def compact(modify):
+    """
+    sort M records by address, +symbol and -symbol of the same field cancel each other.
+    identical records are added twice by loader, so they are kept.
+    ex: [(7, 6, '+', 'B'), (1, 5, '+', 'A'), (7, 6, '-', 'B')] -> [(1, 5, '+', 'A')]
+    :param modify: [(address, length(half byte), sign, symbol)] of external reference.
+    :return: [(address, length(half byte), sign, symbol)]
+    """
+    count = {}
+    for address, half, sign, symbol in modify:
+        key = (address, half, symbol)
+        count[key] = count.get(key, 0) + (-1 if sign == '-' else 1)
+
+    out = []
+    for (address, half, symbol), n in sorted(count.items()):
+        out.extend([(address, half, '-' if n < 0 else '+', symbol)] * abs(n))
+    return out
+
+
+def render(section, dialect=SICXE):
+    """
+    object program as text records.
+    SIC:    H^name^start^length, T^address^length^object code..., E^entry
+    SIC/XE: H^name^start^length, D^(symbol^address) * 5, R^symbol * 11, T^address^length^object code...,
+            Maddress length sign symbol, E entry
+    relocation bits: H^name^start^length^R, T^address^length^mask^object code...
+    :param section: Section.
+    :param dialect: SIC or SICXE.
+    :return: string.
+    """
+    out = [head(section)]
+    masks = section.masks
+    for j, (address, length, codes) in enumerate(section.text):
+        out.append(text_row(address, length, codes, None if masks is None else masks[j]))
+    for modify in section.modify:
+        out.append(modify_row(modify))
+    out.append(end(section, dialect))
+    return ''.join(out)
+
+
+def head(section):
+    """
+    H, D and R records of a control section.
+    :param section: Section, text and modify are not used.
+    :return: string.
+    """
+    # ^R: T records have relocation bit masks.
+    out = ['H^' + section.name.ljust(6) + '^' + A.output_hex(section.start, 6) + '^' +
+           A.output_hex(section.length, 6) + ('' if section.masks is None else '^R') + '\n']
+
+    for j in range(0, len(section.extdef), 5):
+        # EXTDEF: D|(extdef(6)|extdef address(6)) * 5
+        out.append('D^' + '^'.join(symbol.ljust(6) + '^' + A.output_hex(address, 6)
+                                   for symbol, address in section.extdef[j:j + 5]) + '\n')
+
+    for j in range(0, len(section.extref), 11):
+        # EXTREF: R|extref(6) * 11
+        out.append('R^' + '^'.join(symbol.ljust(6) for symbol in section.extref[j:j + 11]) + '\n')
+
+    return ''.join(out)
+
+
+def text_row(address, length, codes, mask=None):
+    """
+    Text: T|row start address(6)|row length(2)|object code(60).
+    with relocation bits: T|row start address(6)|row length(2)|mask|object code(60),
+    mask is left aligned in a hexadecimal digit per 4 object code. ex: 10 relocated object code -> FFC
+    :param address: row start address.
+    :param length: row length(byte).
+    :param codes: [object code(bytes-like)]
+    :param mask: relocation bit mask, None for no mask.
+    :return: string.
+    """
+    row = 'T^' + A.output_hex(address, 6) + '^' + A.output_hex(length, 2) + '^'
+    if mask is not None:
+        digits = (len(codes) + 3) // 4
+        row += A.output_hex(mask << (digits * 4 - len(codes)), digits) + '^'
+    # object code becomes hexadecimal only here, a row is converted to upper case at once.
+    return row + '^'.join([ob_code.hex() for ob_code in codes]).upper() + '\n'
+
+
+def modify_row(modify):
+    """
+    Modify: M|address(6)|length(2)|sign symbol
+    :param modify: (address, length(half byte), sign, symbol)
+    :return: string.
+    """
+    address, length, sign, symbol = modify
+    return 'M' + A.output_hex(address, 6) + A.output_hex(length, 2) + sign + symbol + '\n'
+
+
+def end(section, dialect=SICXE):
+    """
+    E record of a control section.
+    :param section: Section.
+    :param dialect: SIC or SICXE.
+    :return: string.
+    """
+    if dialect == SIC:
+        # End: E|begin address(6)
+        return 'E^' + A.output_hex(section.entry, 6)
+    elif section.entry is not None:
+        # End: E|first executable instruction address(6)
+        return 'E' + A.output_hex(section.entry, 6) + '\n\n\n'
+    else:
+        # control section End: E
+        return 'E\n\n\n'
+
+
+def parse(text):
+    """
+    parse text records into object programs, inverse of render.
+    :param text: object code file content(string).
+    :return: (dialect, [Section])
+    """
+    dialect = SICXE
+    sections = []
+    section = None
+    for row in text.split('\n'):
+        if row == '':
+            continue
+
+        kind = row[0]
+        if kind == 'H':
+            # H^name^start^length, ^R for relocation bits.
+            field = row.split('^')
+            section = Section(field[1].rstrip(' '), int(field[2], 16), int(field[3], 16),
+                              masks=[] if field[4:] == ['R'] else None)
+            sections.append(section)
+        elif kind == 'D':
+            # D^symbol^address^symbol^address...
+            field = row.split('^')
+            for j in range(1, len(field) - 1, 2):
+                section.extdef.append((field[j].rstrip(' '), int(field[j + 1], 16)))
+        elif kind == 'R':
+            # R^symbol^symbol...
+            section.extref.extend(symbol.rstrip(' ') for symbol in row.split('^')[1:])
+        elif kind == 'T':
+            # T^address^length^object code..., T^address^length^mask^object code... for relocation bits.
+            field = row.split('^')
+            codes = field[3:] if section.masks is None else field[4:]
+            section.text.append([int(field[1], 16), int(field[2], 16), [bytes.fromhex(ob_code) for ob_code in codes]])
+            if section.masks is not None:
+                section.masks.append(int(field[3], 16) >> (len(field[3]) * 4 - len(codes)))
+        elif kind == 'M':
+            # Maddress(6)length(2)sign symbol
+            section.modify.append((int(row[1:7], 16), int(row[7:9], 16), row[9:10], row[10:]))
+        elif kind == 'E':
+            if row[1:2] == '^':
+                # SIC End: E^address
+                dialect = SIC
+                section.entry = int(row[2:], 16)
+            elif len(row) > 1:
+                section.entry = int(row[1:], 16)
+
+    return dialect, sections
+
+
+class Writer(object):
+    """
+    output stream of object code and figure writers, it is closed by close or at end of with block.
+    """
+    def __init__(self, file, mode='w'):
+        """
+        :param file: file name, or any file-like object(pipe, io.StringIO...) which has write.
+        :param mode: open mode of file name.
+        """
+        self._own = isinstance(file, str)
+        self._file = open(file, mode) if self._own else file
+
+    def close(self):
+        """
+        close file opened by writer, file-like object given by caller is flushed only.
+        """
+        if self._own:
+            self._file.close()
+        elif hasattr(self._file, 'flush'):
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ObjectWriter(Writer):
+    """
+    write object programs into one buffered stream, a control section is one write.
+    """
+    def __init__(self, file, dialect=SICXE):
+        """
+        :param file: object code file name, or any file-like object(pipe, io.StringIO...) which has write.
+        :param dialect: SIC or SICXE.
+        """
+        super().__init__(file)
+        self.__dialect = dialect
+
+    def write(self, section):
+        """
+        write object program of a control section.
+        :param section: Section.
+        """
+        self._file.write(render(section, self.__dialect))
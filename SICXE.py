@@ -1,240 +1,352 @@
-import csv
+from concurrent.futures import ProcessPoolExecutor
 import Arithmetic as A
-
-
-class SicXE(object):
+import Binary
+import Cache
+import Core
+import Diagnostics as D
+import OnePass
+import Optab
+import Profile
+import Record
+import Source
+
+
+class SicXE(Core.Core):
     """
-    SICXE class
+    SICXE class, SIC/XE configuration of Core.
     """
+    DIALECT = Record.SICXE
+    XE = True
+
     def __init__(self):
         """
-        code structure: [location, block, symbol, operator, operand, program counter, object code]
-        modify structure: [(string)]
-        operator table: {operator: [opcode, format]}
-        symbol table: {symbol: [symbol address, symbol block]}
-        literal table: {ascii code: [operand, length, location, block, whether append in code]}
+        code structure: [Line(location, block, symbol, operator, operand, program counter, object code)]
+        modify structure: [(address, length(half byte), sign, symbol)]
+        symbol table: Symtab.SymbolTable of symbols and literals(object code bytes as name), address and block.
+                      pass1 resolves operand symbol or literal of instruction row into id(Line.value).
+        literal table: {object code: operand} in first reference order, a literal is placed into pool when
+                       its id is not defined, reference after it is placed undefines it so it is placed again.
+        literal pool: {row index: [Line]}, literal rows placed after code[row index] by LTORG or section end.
         block table:[0, block 0 location, block 1 location, ...], 0 index for absolutely term.
-        register table: {register: register numbering}
-        extdef: {external definition for external symbol: address}
+        block number: {block name: block number} of running pass1.
+        extdef: [external definition for external symbol]
         extref: [external reference(string)]
         base: base register
         main: whether this program is main program
         """
-        self.__code = []
+        super().__init__()
         self.__modify = []
-        self.__operator_tab = {}
-        self.__symbol_tab = {}
         self.__literal_tab = {}
-        self.__extdef = {}
+        self.__extdef = []
         self.__extref = []
         self.__block_tab = [0]
-        self.__register_tab = {'A': '0', 'X': '1', 'L': '2', 'PC': '8', 'SW': '9',
-                               'B': '3', 'S': '4', 'T': '5', 'F': '6'}
+        self.__block_number = {'': 0}
         self.__base = 0
-        self.__start_address = 0
-        self.__length = 0
         self.__main = True
-
-    def run(self, code_file, op_file, ob_file):
+        self.__coalesce = False
+        self.__relocation_bits = False
+        self._pass1_tab.update({'LTORG': self.__ltorg, 'EQU': self.__equ, 'ORG': self.__org, 'USE': self.__use,
+                                'EXTDEF': self.__extdef_row, 'EXTREF': self.__extref_row,
+                                'BASE': self.__base1, 'NOBASE': self.__nothing})
+        self._pass2_tab.update({'WORD': self.__word, 'BASE': self.__base_row, 'NOBASE': self.__nobase})
+
+    def run(self, code_file, op_file, ob_file, use_mmap=False, workers=None, cache=None, binary=False,
+            profile=None, one_pass=False, diagnostics=None, figure_file=None, libraries=(), include_path=(),
+            coalesce=False, relocation_bits=False):
         """
         run code and generate object code.
         :param code_file: assembly code file(.txt)
         :param op_file: operator file(.csv)
-        :param ob_file: object code file(.txt)
+        :param ob_file: object code file(.txt) or file-like object.
+        :param use_mmap: whether read assembly code file through mmap.
+        :param workers: None for assemble control sections one by one,
+                        otherwise assemble them on process pool of workers processes(0 for cpu count).
+                        with workers or cache, rows keep assembly result only when figure_file is given,
+                        so figure() after run has no location and object code without it.
+        :param cache: Cache.BuildCache, control section which is not changed is not assembled again.
+        :param binary: whether write binary object file instead of text records.
+        :param profile: Profile.Profile to record phase timers and counters into, None for disabled.
+                        phases which run in worker processes are not timed, their counters are recorded.
+        :param one_pass: assemble with OnePass, object code is written while rows are read and no code is kept,
+                         so figure() has no row to write. USE block is not supported.
+        :param diagnostics: Diagnostics.Diagnostics to collect errors into, None for write errors to stdout
+                            after run.
+        :param figure_file: figure file(.txt) written on a background thread while object code is written,
+                            rows of each control section are written once it is assembled. None for no figure,
+                            one pass writes no figure.
+        :param libraries: macro library files(.txt).
+        :param include_path: include directories searched after directory of assembly code file.
+        :param coalesce: whether T records are packed by final address, see __section. one pass ignores it.
+        :param relocation_bits: whether relocation M records are written as relocation bit masks of T records,
+                                see Record.relocation_bits. one pass ignores it.
         """
-        self.__load_optab(op_file)
-        self.__load_code(code_file)
-        self.__main = True
-        start = 0
-        end = 0
-        while self.__code[end][3] != 'END':
-            temp, end, name = self.pass1(start)
-            self.pass2(start)
-            self.object_code(ob_file, start, temp, name)
-            self.__symbol_tab.clear()
-            self.__literal_tab.clear()
-            self.__extdef.clear()
-            self.__extref.clear()
-            self.__modify.clear()
-            self.__block_tab = [0]
-            self.__base = 0
-            self.__start_address = 0
-            self.__length = 0
-            self.__main = False
-            start = temp
-
-    def object_code(self, file_name, start, end, name):
+        self._profile = profile
+        self.__coalesce = coalesce
+        self.__relocation_bits = relocation_bits
+        if one_pass:
+            with Profile.phase(profile, 'one_pass'):
+                OnePass.OnePass().run(code_file, op_file, ob_file, use_mmap, binary, diagnostics, libraries,
+                                      include_path)
+            return
+
+        self._diagnostics = diagnostics if diagnostics is not None else D.Diagnostics()
+        listing = None
+        try:
+            with Profile.phase(profile, 'load_optab'):
+                self._load_optab(op_file)
+            with Profile.phase(profile, 'load_code'):
+                self._load_code(code_file, use_mmap, libraries, include_path)
+
+            listing = self._listing(figure_file)
+            if workers is not None or cache is not None:
+                self.__run_sections(op_file, ob_file, workers, cache, binary, listing)
+                return
+
+            self.__main = True
+            start = 0
+            end = 0
+            with Binary.writer(ob_file, Record.SICXE, binary) as writer:
+                while self._fetch(end).operator != 'END':
+                    with Profile.phase(profile, 'pass1'):
+                        temp, end, name = self.pass1(start)
+                    with Profile.phase(profile, 'pass2'):
+                        self.pass2(start)
+                    with Profile.phase(profile, 'object_code'):
+                        self.object_code(writer, start, temp, name)
+                    if listing is not None:
+                        listing.write(self._lines(start, temp))
+                    self._symbol_tab.clear()
+                    self.__literal_tab.clear()
+                    self.__extdef.clear()
+                    self.__extref = []
+                    self.__modify = []
+                    self.__block_tab = [0]
+                    self.__base = 0
+                    self._start_address = 0
+                    self._length = 0
+                    self.__main = False
+                    start = temp
+
+            with Profile.phase(profile, 'load_code'):
+                # load remaining rows after END.
+                self._code.extend(self._source)
+            if listing is not None:
+                listing.write(self._lines(start, len(self._code)))
+        finally:
+            self._close_listing(listing)
+            if diagnostics is None:
+                # rows are formatted only here.
+                self._diagnostics.report(self.row)
+
+    def __run_sections(self, op_file, ob_file, workers, cache, binary, listing=None):
         """
-        put object code into object code file.
-        object_t structure: [block, row start address, row length, object code]
-        Algorithm:
-        for i := 0 to code.length -1
-            if object_t.length > 60 or address interrupt
-                object_t next row
-
-        write header into file
-        for i := 0 to object_t.length -1
-            write object_t[i] into file
-        write end into file
-
-        :param file_name: object code file(.txt).
-        :param start: this program start index.
-        :param end: this program end index.
-        :param name: assembly code name.
+        split code into control sections and assemble them independently, on process pool if workers is given.
+        every control section has its own tables, object code is written in source order.
+        control section found in build cache is not assembled again.
+        :param op_file: operator file(.csv)
+        :param ob_file: object code file(.txt) or file-like object.
+        :param workers: None for in this process, otherwise process quantity(0 for cpu count).
+        :param cache: Cache.BuildCache or None.
+        :param binary: whether write binary object file.
+        :param listing: Listing.ListingWriter which rows of each control section are written into, or None.
         """
-        TLENGTH = 60
-        object_t = []
-        first = True
-
-        for index in range(start, end):
-            # Text: T|row start address(6)|row length(2)|object code(60).
-            if self.__code[index][3] == 'RESW' or self.__code[index][3] == 'RESB':
-                # RESW and RESB interrupt continuous address.
-                first = True
-
-            ob_code = self.__code[index][6]
-            loc = self.__code[index][0]
-            block = self.__code[index][1]
-
-            if ob_code != '':
-                # has object code.
-                if first:
-                    # object_t generate new row.
-                    object_t.append([block, self.__real_address(loc, block), 0, ''])
-                    first = False
-
-                if block != object_t[-1][0] or object_t[-1][2] * 2 + len(ob_code) > TLENGTH:
-                    object_t.append([block, self.__real_address(loc, block), len(ob_code) // 2, '^' + ob_code])
+        with Profile.phase(self._profile, 'load_code'):
+            self._code.extend(self._source)
+        sections = self.__split_sections()
+        executor = ProcessPoolExecutor(max_workers=workers or None) if workers is not None else None
+        # worker process counts into its own profile, counters are sent back.
+        counters = Profile.Profile() if self._profile is not None else None
+        # result of each section: (Record.Section, [Diagnostic], rows, counters) or future of it.
+        results = []
+        keys = []
+
+        for k, (start, end) in enumerate(sections):
+            code = self._code[start:end]
+            if k < len(sections) - 1:
+                # CSECT row stops pass1 and pass2 at this section end.
+                code.append(Source.Line('', 'CSECT'))
+
+            result = None
+            key = None
+            if cache is not None:
+                # key: assembler version, operator table, main program or not, options, expanded rows.
+                # rows of include files are in code, value is EQU value resolved by include file cache,
+                # so key covers every field a worker process gets.
+                key = Cache.digest(Cache.VERSION, Optab.digest(op_file), str(k == 0), str(self.__coalesce),
+                                   str(self.__relocation_bits), str(listing is not None),
+                                   '\n'.join([line.symbol + '\t' + line.operator + '\t' + line.operand + '\t' +
+                                              str(line.value) for line in code]))
+                result = cache.get(key)
+                # cached result does not need put again.
+                key = None if result is not None else key
+
+            if result is None:
+                if executor is not None:
+                    # source fields only, Line is built again in worker process.
+                    rows = [(line.symbol, line.operator, line.operand, line.value) for line in code]
+                    result = executor.submit(assemble_section, rows, op_file, k == 0, counters, self.__coalesce,
+                                             self.__relocation_bits, listing is not None)
                 else:
-                    object_t[-1][3] += '^' + ob_code
-                    object_t[-1][2] += len(ob_code) // 2
-
-        with open(file_name, 'a') as file:
-            if self.__main:
-                # if this program is main program then clear file content.
-                file.seek(0, 0)
-                file.truncate()
-
-            # Header: H|file name(6)|begin address(6)|code length(6)
-            file.write('H^' + name.ljust(6) + '^' +
-                       A.output_hex(self.__start_address, 6) + '^' + A.output_hex(self.__length, 6) + '\n')
-
-            if len(self.__extdef.keys()) > 0:
-                n = 1
-                j = 0
-                for key in self.__extdef.keys():
-                    # EXTDEF: D|(extdef(6)|extdef address(6)) * 6
-                    if n == 1:
-                        file.write('D^' + key.ljust(6) + '^' +
-                                   A.output_hex(self.__real_address(self.__extdef[key][0], self.__extdef[key][1]), 6))
-                        n += 1
-                    else:
-                        file.write('^' + key.ljust(6) + '^' +
-                                   A.output_hex(self.__real_address(self.__extdef[key][0], self.__extdef[key][1]), 6))
-                        n += 1
-
-                    if n == 6 or j == len(self.__extdef.keys()) - 1:
-                        # if n == 6 or last one then next row.
-                        file.write('\n')
-                        n = 1
-
-                    j += 1
-
-            if len(self.__extref) > 0:
-                # EXTREF: R|exref(6) * 12
-                n = 1
-                j = 0
-                for s in self.__extref:
-                    if n == 1:
-                        file.write('R^' + s.ljust(6))
-                        n += 1
-                    else:
-                        file.write('^' + s.ljust(6))
-                        n += 1
-
-                    if n == 12 or j == len(self.__extref) - 1:
-                        # if n == 12 or last one then next row.
-                        file.write('\n')
-                        n = 1
-
-                    j += 1
-
-            # Text
-            for j in range(len(object_t)):
-                file.write('T^' + A.output_hex(object_t[j][1], 6) +
-                           '^' + A.output_hex(object_t[j][2], 2) + object_t[j][3] + '\n')
-
-            for s in self.__modify:
-                file.write(s + '\n')
-
-            if self.__main:
-                # End: E|first executable instruction address(6)
-                file.write('E' + A.output_hex(object_t[0][1], 6) + '\n\n\n')
-            else:
-                # control section End: E
-                file.write('E' + '\n\n\n')
-
-    def row(self, index):
+                    result = SicXE().assemble(code, op_file, k == 0, self._profile, self.__coalesce,
+                                              self.__relocation_bits, listing is not None) + (None,)
+
+            results.append(result)
+            keys.append(key)
+
+        try:
+            with Binary.writer(ob_file, Record.SICXE, binary) as writer:
+                for (start, end), result, key in zip(sections, results, keys):
+                    if not isinstance(result, tuple):
+                        result = result.result()
+                        if self._profile is not None:
+                            # worker process counts into its own profile.
+                            for name, n in result[3].items():
+                                self._profile.count(name, n)
+                    if key is not None:
+                        # counters are not cached.
+                        cache.put(key, result[:3])
+
+                    section, records, rows = result[:3]
+                    # row index of section is relative to its start.
+                    self._diagnostics.extend(records, start)
+                    with Profile.phase(self._profile, 'object_code'):
+                        writer.write(section)
+                    self.__apply_rows(start, end, rows)
+                    if listing is not None:
+                        listing.write(self._lines(start, end))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def __split_sections(self):
         """
-        a row of code.
-        :param index: row index.
-        :return: string (location block symbol operator operand object code).
+        split code by CSECT.
+        :return: [(start index, end index)] of each control section, last one contain END and rows after it.
         """
-        s = ''
-        if self.__code[index][0] != '':
-            # if code has loc(code[index][0]) then write into row.
-            s += A.output_hex(self.__code[index][0], 4).ljust(7)
-        else:
-            s += ''.ljust(7)
-
-        s += str(self.__code[index][1]).ljust(3)
+        sections = []
+        start = 0
+        for index, line in enumerate(self._code):
+            if line.operator == 'END':
+                break
+            elif line.operator == 'CSECT' and line.symbol != '.':
+                sections.append((start, index))
+                start = index
 
-        for j in range(2, 5):
-            # write symbol, operator and operand into row.
-            s += self.__code[index][j].ljust(15)
-        # object code
-        s += self.__code[index][6]
-        return s
+        sections.append((start, len(self._code)))
+        return sections
 
-    def figure(self, figure_file):
+    def __apply_rows(self, start, end, rows):
         """
-        assembly code write figure.
-        :param figure_file: figure name to write(.txt).
+        put assembled rows of a control section into code, see __rows.
+        :param start: section start index.
+        :param end: section end index.
+        :param rows: rows of the control section.
         """
-        with open(figure_file, 'w') as file:
-            for index in range(len(self.__code)):
-                # write row into file.
-                file.write(self.row(index) + '\n')
+        code = self._code
+        indices, locs, blocks, codes, pools = rows
+        for index, loc, block, ob_code in zip(indices, locs, blocks, codes):
+            if index < end - start:
+                # appended CSECT row is not a row of code.
+                line = code[start + index]
+                line.loc = loc
+                line.block = block
+                line.object_code = ob_code
+        for index, pool in pools.items():
+            self._literal_pool[start + index] = [Source.Line('*', operand, '', loc, block, 0, ob_code)
+                                                 for operand, loc, block, ob_code in pool]
+
+    def __rows(self, listing):
+        """
+        compact assembled rows as columns, so worker process does not send Line back.
+        figure needs every row and literal pool, otherwise only rows with errors are reported.
+        :param listing: whether figure is written.
+        :return: (row indices, [location], [block], [object code], {row index: [(operand, location, block,
+                 object code)]})
+        """
+        code = self._code
+        if listing:
+            indices = range(len(code))
+            pools = {index: [(line.operator, line.loc, line.block, line.object_code) for line in pool]
+                     for index, pool in self._literal_pool.items()}
+        else:
+            indices = sorted({index for index, _, _ in self._diagnostics.records if index is not None})
+            pools = {}
+        return (indices, [code[j].loc for j in indices], [code[j].block for j in indices],
+                [code[j].object_code for j in indices], pools)
 
-    def __load_code(self, file_name):
+    def assemble(self, code, op_file, main=True, profile=None, coalesce=False, relocation_bits=False,
+                 listing=False):
         """
-        load assembly code into __code.
-        code structure: [location, block, symbol, operator, operand, program counter, object code]
-        :param file_name: assembly code file(.txt).
+        assemble one control section.
+        :param code: [Line] of this control section, end with END or CSECT row.
+        :param op_file: operator file(.csv)
+        :param main: whether this control section is main program.
+        :param profile: Profile.Profile or None.
+        :param coalesce: whether T records are packed by final address.
+        :param relocation_bits: whether relocation M records are written as relocation bit masks.
+        :param listing: whether rows carry every row for figure, otherwise rows with errors only.
+        :return: Record.Section, [Diagnostic], rows(see __rows) of this control section.
+        """
+        self._profile = profile
+        self._diagnostics = D.Diagnostics(capacity=None)
+        with Profile.phase(profile, 'load_optab'):
+            self._load_optab(op_file)
+        self._code = code
+        self.__main = main
+        self.__coalesce = coalesce
+        self.__relocation_bits = relocation_bits
+        with Profile.phase(profile, 'pass1'):
+            temp, end, name = self.pass1(0)
+        with Profile.phase(profile, 'pass2'):
+            self.pass2(0)
+        with Profile.phase(profile, 'object_code'):
+            section = self.__section(0, temp, name)
+        return section, self._diagnostics.records, self.__rows(listing)
+
+    def object_code(self, writer, start, end, name):
         """
-        with open(file_name, 'r') as file:
-            content = file.readlines()
-        for s in content:
-            # loc, block, symbol, operator, operand.
-            self.__code.append([''] * 5)
-            # cut by tab.
-            row = s[:-1].split('\t')
-            for i in range(2, len(row)+2):
-                self.__code[-1][i] = row[i - 2]
-            # program counter
-            self.__code[-1].append(0)
-            # object code
-            self.__code[-1].append('')
+        put object code into object code file.
+        :param writer: Record.ObjectWriter or Binary.BinaryWriter.
+        :param start: this program start index.
+        :param end: this program end index.
+        :param name: assembly code name.
+        """
+        writer.write(self.__section(start, end, name))
 
-    def __load_optab(self, file_name):
+    def __section(self, start, end, name):
         """
-        load operator table.
-        operator table structure: {operator: [opcode, format]}
-        :param file_name: operator table file(.csv).
+        generate object program of a control section.
+        T record: a new row starts when block changes, RESW or RESB interrupts continuous address,
+        or row is over 30 bytes.
+        coalesced T record: object code is sorted by final address, a new row starts when address is not
+        continuous or row is over 30 bytes, so USE blocks do not fragment T records.
+        relocation bits: relocation M records become relocation bit masks of T records.
+        :param start: this program start index.
+        :param end: this program end index.
+        :param name: assembly code name.
+        :return: Record.Section.
         """
-        with open(file_name, newline='') as csv_file:
-            op = csv.reader(csv_file)
-            self.__operator_tab = {key: [opcode, format_] for key, opcode, format_ in op}
+        if self.__coalesce:
+            text = Record.pack(self._coalesced_items(start, end))
+        else:
+            text = Record.pack(self._text_items(start, end))
+        # external symbol address, undefined one is start address.
+        extdef = [(key, self.__real_address(*self._symbol_tab[key]) if key in self._symbol_tab else
+                   self.__real_address(0, 0)) for key in self.__extdef]
+        # main program End: first executable instruction address, start address when there is no object code,
+        # control section End: no address.
+        entry = None
+        if self.__main:
+            entry = text[0][0] if len(text) > 0 else self._start_address
+        if self._profile is not None:
+            self._profile.count('t_records', len(text))
+            self._profile.count('m_records', len(self.__modify))
+        section = Record.Section(name, self._start_address, self._length, extdef, self.__extref, text,
+                                 self.__modify, entry)
+        if self.__relocation_bits:
+            Record.relocation_bits(section)
+        return section
+
 
     def __real_address(self, loc, block):
         """
@@ -245,6 +357,9 @@ class SicXE(object):
         """
         return loc + self.__block_tab[block+1]
 
+    def _address(self, line):
+        return self.__real_address(line.loc, line.block)
+
     def pass1(self, start):
         """
         generate symbol table and address location and corresponding block.
@@ -253,204 +368,57 @@ class SicXE(object):
         :param start: start index.
         :return: next start index, end index, assembly code file name.
         """
-        locctr = 0
+        self._locctr = 0
+        self._block = 0
+        # default block = 0.
+        self.__block_number = {'': 0}
         index = start
         name = ''
-        block_counter = 0
-        current_block = 0
-        # default block = 0.
-        block_number = {'': 0}
 
-        if self.__main and self.__code[start][3] == 'START':
+        if self.__main and self._fetch(start).operator == 'START':
             # set begin address location START operand, if START is not exist then begin 0.
-            locctr += int(self.__code[0][4], 16)
-            self.__code[start][0] = locctr
-            self.__code[start][1] = current_block
-            self.__base = locctr
-            name = self.__code[start][2]
+            self._locctr += int(self._code[0].operand, 16)
+            self._code[start].loc = self._locctr
+            self._code[start].block = self._block
+            self.__base = self._locctr
+            name = self._code[start].symbol
             index += 1
 
-        if not self.__main and self.__code[start][3] == 'CSECT':
-            self.__code[index][0] = locctr
-            self.__code[index][1] = current_block
-            name = self.__code[index][2]
+        if not self.__main and self._fetch(start).operator == 'CSECT':
+            self._code[index].loc = self._locctr
+            self._code[index].block = self._block
+            name = self._code[index].symbol
             index += 1
 
-        self.__start_address = locctr
+        self._start_address = self._locctr
         # block table initialize [0], 0 index for absolutely term.
-        self.__block_tab.append(locctr)
-
-        while self.__code[index][3] != 'END':
-            if self.__code[index][2] == '.':
-                # . is annotation.
-                index += 1
-                continue
-            elif self.__code[index][3] == 'CSECT':
-                # control section end.
-                index -= 1
-                break
-            elif self.__code[index][2] == '' and self.__code[index][3] == '' and self.__code[index][4] == '':
-                # blank line.
-                index += 1
-                continue
-
-            symbol = self.__code[index][2]
-            operator = self.__code[index][3]
-            operand = self.__code[index][4]
-            extend = 0
-
-            if symbol in self.__symbol_tab.keys():
-                print(self.row(index) + '   ' + symbol + ' is duplicate symbol')
-            elif symbol != '':
-                self.__symbol_tab[symbol] = [locctr, current_block]
-
-            if symbol in self.__extdef.keys():
-                # external definition for external symbol.
-                self.__extdef[symbol][0] = locctr
-                self.__extdef[symbol][1] = current_block
-
-            if operator[0] == '+':
-                # remove + ,ex: +ADD to ADD.
-                extend = 1
-                operator = operator[1:]
-
-            if operand != '' and operand[0] == '=':
-                """
-                key = ascii code ex: =X'05' -> key = '05'
-                literal table: {ascii code: [operand, length, location, block, whether append in code]}
-                """
-                key = A.xc_to_ascii(operand[1:])
-                self.__literal_tab[key] = [operand, len(key) // 2, 0, current_block, False]
-
-            if operator in self.__operator_tab.keys():
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-                locctr = locctr + int(self.__operator_tab[operator][1]) + extend
-                self.__length = self.__length + int(self.__operator_tab[operator][1]) + extend
-            elif operator == 'WORD':
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-                locctr += 3
-                self.__length += 3
-            elif operator == 'RESW':
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-                locctr += (int(self.__code[index][4]) * 3)
-                self.__length += (int(self.__code[index][4]) * 3)
-            elif operator == 'RESB':
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-                locctr += int(self.__code[index][4])
-                self.__length += int(self.__code[index][4])
-            elif operator == 'BYTE':
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-                locctr += len(A.xc_to_ascii(operand)) // 2
-                self.__length += len(A.xc_to_ascii(operand)) // 2
-            elif operator == 'LTORG':
-                # append literal table which do not append to code.
-                for key in self.__literal_tab.keys():
-                    if not self.__literal_tab[key][4]:
-                        self.__code.insert(index + 1, [locctr, current_block, '*', self.__literal_tab[key][0], '', 0, key])
-                        self.__literal_tab[key][2] = locctr
-                        self.__literal_tab[key][3] = current_block
-                        self.__literal_tab[key][4] = True
-                        locctr += self.__literal_tab[key][1]
-                        self.__length += self.__literal_tab[key][1]
-                        index += 1
-            elif operator == 'EQU':
-                loc = 0
-                if operand == '*':
-                    # * program counter.
-                    loc = locctr
-                    self.__symbol_tab[symbol] = [loc, current_block]
-                    self.__code[index][1] = current_block
-                else:
-                    if operand.find('*') < 0 and operand.find('/') < 0:
-                        """
-                        operand dose not contain multiplication and division.
-                        loc is computed operand value.
-                        plus and minus are positive symbol quantity and negative symbol quantity in operand.
-                        error is whether operand is valid.
-                        """
-                        loc, plus, minus, error = A.expression(self.__modify, self.__symbol_tab, self.__extref, operand)
-
-                        if plus == 1 and minus == 0 and not error:
-                            self.__symbol_tab[symbol] = [loc, current_block]
-                            self.__code[index][1] = current_block
-                        elif plus == minus and not error:
-                            # block -1 for absolutely term.
-                            self.__symbol_tab[symbol] = [loc, -1]
-                        else:
-                            """
-                            pair of symbol has opposite sign(plus == minus)
-                            except signal symbol(plus == 1 and minus == 0) and
-                            integer(plus == 0 and minus == 0).
-                            """
-                            print(self.row(index) + '   ' + operand + ' is error expression.')
-                    else:
-                        # operand contain multiplication and division.
-                        print(self.row(index) + '   ' + operand + ' is error expression.')
-
-                self.__code[index][0] = loc
-            elif operator == 'ORG':
-                """
-                loc is computed operand value.
-                error is whether operand is valid.
-                """
-                loc, plus, minus, error = A.expression(self.__modify, self.__symbol_tab, self.__extref, operand)
-                if error:
-                    print(self.row(index) + '   ' + operand + ' is error expression.')
-                else:
-                    # change Locctr temporarily.
-                    locctr = loc
-            elif operator == 'USE':
-                # change block.
-                self.__block_tab[current_block+1] = locctr
-                if operand in block_number.keys():
-                    block = block_number[operand]
-                    locctr = self.__block_tab[block+1]
-                else:
-                    # new block name.
-                    block_counter += 1
-                    block_number[operand] = block_counter
-                    locctr = 0
-                    self.__block_tab.append(0)
-
-                current_block = block_number[operand]
-                self.__code[index][0] = locctr
-                self.__code[index][1] = current_block
-            elif operator == 'EXTDEF':
-                # external definition for external symbol.
-                for key in operand.split(','):
-                    self.__extdef[key] = [0, 0]
-            elif operator == 'EXTREF':
-                # external reference.
-                self.__extref = operand.split(',')
-            elif operator != 'BASE' and operator != 'NOBASE':
-                print(self.row(index) + '   ' + operator + ' is invalid operation code')
-
-            # code[index][5] is program counter.
-            self.__code[index][5] = locctr
-            index += 1
+        self.__block_tab.append(self._locctr)
+
+        index = self._pass1_rows(index)
+        if self._code[index].operator == 'CSECT':
+            # control section end, CSECT row starts next section.
+            index -= 1
 
         end = index
-        self.__block_tab[current_block+1] = locctr
+        self.__block_tab[self._block+1] = self._locctr
 
         # locctr = first block address.
         locctr = self.__block_tab[1]
 
-        for key in self.__literal_tab.keys():
-            # append remaining literal to code.
-            if not self.__literal_tab[key][4]:
-                index += 1
-                self.__code.insert(index, [locctr, 0, '*', self.__literal_tab[key][0], '', 0, key])
-                self.__literal_tab[key][2] = locctr
-                locctr += self.__literal_tab[key][1]
-                self.__length += self.__literal_tab[key][1]
+        symbol_tab = self._symbol_tab
+        for key, operand in self.__literal_tab.items():
+            # put remaining literal into literal pool after section end, in default block.
+            if not symbol_tab.defined[symbol_tab.ref(key)]:
+                if self._profile is not None:
+                    self._literals += 1
+                self._literal_pool.setdefault(end, []).append(Source.Line('*', operand, '', locctr, 0, 0, key))
+                symbol_tab.define(key, locctr, 0)
+                locctr += len(key)
+                self._length += len(key)
 
         block_length = self.__block_tab[1]
-        self.__block_tab[1] = self.__start_address
+        # location of default block already starts at start address.
+        self.__block_tab[1] = 0
 
         for j in range(2, len(self.__block_tab)):
             """
@@ -461,194 +429,299 @@ class SicXE(object):
             self.__block_tab[j] = self.__block_tab[j-1] + block_length
             block_length = temp
 
+        self._count()
+
         # next section start index, end index, assembly file name.
         return index + 1, end, name
 
+    def _define(self, index, line):
+        symbol = line.symbol
+        if symbol in self._symbol_tab:
+            self._diagnostics.error(index, D.DUPLICATE_SYMBOL, symbol)
+        elif symbol != '':
+            self._symbol_tab.define(symbol, self._locctr, self._block)
+
+    def _instruction1(self, index, line):
+        if line.kind == Source.LITERAL:
+            """
+            key = object code ex: =X'05' -> key = b'\\x05'
+            literal table: {object code: operand}
+            """
+            key = line.data
+            self.__literal_tab[key] = line.target
+            line.value = self._symbol_tab.ref(key)
+            # literal is placed by next pool even if it is placed already.
+            self._symbol_tab.defined[line.value] = 0
+        elif line.kind == Source.SYMBOL:
+            # operand symbol id.
+            line.value = self._symbol_tab.ref(line.target)
+
+        self._advance(line, line.entry.format + line.extend)
+
+    def __ltorg(self, index, line):
+        # put literal which do not place yet into literal pool after this row.
+        pool = self._literal_pool.setdefault(index, [])
+        symbol_tab = self._symbol_tab
+        for key, operand in self.__literal_tab.items():
+            if not symbol_tab.defined[symbol_tab.ref(key)]:
+                if self._profile is not None:
+                    self._literals += 1
+                pool.append(Source.Line('*', operand, '', self._locctr, self._block, 0, key))
+                symbol_tab.define(key, self._locctr, self._block)
+                self._locctr += len(key)
+                self._length += len(key)
+
+    def __expression(self, index, operand):
+        """
+        compute operand value, report undefined symbols, external references need modify records.
+        :param index: row index.
+        :param operand: operand.
+        :return: Arithmetic.Value.
+        """
+        value = A.expression(self._symbol_tab, self.__extref, operand)
+        if self._profile is not None:
+            self._expressions += 1
+            self._lookups += value.plus + value.minus
+        for name in value.undefined:
+            self._diagnostics.error(index, D.UNDEFINED_SYMBOL, name)
+        return value
+
+    def __equ(self, index, line):
+        symbol = line.symbol
+        operand = line.operand
+        loc = 0
+        if line.value is not None:
+            # absolute value resolved once by include file cache.
+            loc = line.value
+            self._symbol_tab.define(symbol, loc, -1)
+        elif operand == '*':
+            # * program counter.
+            loc = self._locctr
+            self._symbol_tab.define(symbol, loc, self._block)
+            line.block = self._block
+        elif operand.find('*') < 0 and operand.find('/') < 0:
+            """
+            operand dose not contain multiplication and division.
+            loc is computed operand value.
+            plus and minus are positive symbol quantity and negative symbol quantity in operand.
+            error is whether operand is valid.
+            """
+            value = self.__expression(index, operand)
+            self.__modify.extend(A.modification(value.external, 0))
+            loc, plus, minus, error = value.value, value.plus, value.minus, value.error
+
+            if plus == 1 and minus == 0 and not error:
+                self._symbol_tab.define(symbol, loc, self._block)
+                line.block = self._block
+            elif plus == minus and not error:
+                # block -1 for absolutely term.
+                self._symbol_tab.define(symbol, loc, -1)
+            else:
+                """
+                pair of symbol has opposite sign(plus == minus)
+                except signal symbol(plus == 1 and minus == 0) and
+                integer(plus == 0 and minus == 0).
+                """
+                self._diagnostics.error(index, D.ERROR_EXPRESSION, operand)
+        else:
+            # operand contain multiplication and division.
+            self._diagnostics.error(index, D.ERROR_EXPRESSION, operand)
+
+        line.loc = loc
+
+    def __org(self, index, line):
+        """
+        loc is computed operand value.
+        error is whether operand is valid.
+        """
+        value = self.__expression(index, line.operand)
+        self.__modify.extend(A.modification(value.external, 0))
+        if value.error:
+            self._diagnostics.error(index, D.ERROR_EXPRESSION, line.operand)
+        else:
+            # change Locctr temporarily.
+            self._locctr = value.value
+
+    def __use(self, index, line):
+        # change block.
+        operand = line.operand
+        self.__block_tab[self._block+1] = self._locctr
+        if operand in self.__block_number:
+            block = self.__block_number[operand]
+            self._locctr = self.__block_tab[block+1]
+        else:
+            # new block name.
+            self.__block_number[operand] = len(self.__block_number)
+            self._locctr = 0
+            self.__block_tab.append(0)
+
+        self._block = self.__block_number[operand]
+        line.loc = self._locctr
+        line.block = self._block
+
+    def __extdef_row(self, index, line):
+        # external definition for external symbol.
+        for key in line.operand.split(','):
+            if key not in self.__extdef:
+                self.__extdef.append(key)
+
+    def __extref_row(self, index, line):
+        # external reference.
+        self.__extref = line.operand.split(',')
+
+    def __base1(self, index, line):
+        # block of program counter, BASE * is handled by pass2.
+        line.value = self._block
+
+    def __nothing(self, index, line):
+        # NOBASE is handled by pass2.
+        pass
+
     def pass2(self, start):
         """
         generate object code
         """
         index = start
 
-        if self.__main and self.__code[start][3] == 'START':
+        if self.__main and self._code[start].operator == 'START':
             index += 1
 
-        if not self.__main and self.__code[start][3] == 'CSECT':
+        if not self.__main and self._code[start].operator == 'CSECT':
             index += 1
 
-        while self.__code[index][3] != 'END':
-            if self.__code[index][2] == '.':
-                # . is annotation.
-                index += 1
-                continue
-            elif self.__code[index][3] == 'CSECT':
-                # control section end.
-                break
-            elif self.__code[index][2] == '' and self.__code[index][3] == '' and self.__code[index][4] == '':
-                # blank line.
-                index += 1
-                continue
-
-            operator = self.__code[index][3]
-            operand = self.__code[index][4]
-            n, i, x, b, p, e = [0] * 6
-
-            if operator[0] == '+':
-                # check format 4 and remove +.
-                operator = operator[1:]
-                e = 1
-
-            if operator in self.__operator_tab.keys():
-                if self.__operator_tab[operator][1] == '1':
-                    # format 1
-                    # object code: opcode 8 bit.
-                    self.__code[index][6] = self.__operator_tab[operator][0]
-                elif self.__operator_tab[operator][1] == '2':
-                    # format 2 register.
-                    r1, r2 = '0', '0'
-                    temp = operand.split(',')
-
-                    if len(temp) == 1:
-                        # one register.
-                        if temp[0] in self.__register_tab.keys():
-                            r1 = self.__register_tab[temp[0]]
-                        else:
-                            print(self.row(index) + '   ' + temp[0] + ' is invalid register.')
-
-                        # object code: opcode 8 bit + register1 4 bit + register2 4 bit.
-                        self.__code[index][6] = self.__operator_tab[operator][0] + r1 + r2
-                    elif len(temp) == 2:
-                        # two register.
-                        if temp[0] in self.__register_tab.keys():
-                            r1 = self.__register_tab[temp[0]]
-                        else:
-                            print(self.row(index) + '   ' + temp[0] + ' is invalid register.')
-
-                        if temp[1] in self.__register_tab.keys():
-                            r2 = self.__register_tab[temp[1]]
-                        else:
-                            print(self.row(index) + '   ' + temp[1] + ' is invalid register.')
-
-                        # object code: opcode 8 bit + register1 4 bit + register2 4 bit.
-                        self.__code[index][6] = self.__operator_tab[operator][0] + r1 + r2
-                    else:
-                        print(self.row(index) + '   ' + operand + ' is invalid operand.')
-                else:
-                    # format 3 or format 4
-                    if operand != '':
-                        if operand[-2:] == ',X':
-                            # check operand has index or not and remove ,X.
-                            operand = operand[:-2]
-                            x = 1
-
-                        if operand[0] == '@':
-                            # check operand is @(indirect) and remove @.
-                            n = 1
-                            operand = operand[1:]
-                        elif operand[0] == '#':
-                            # check operand is #(immediate) and remove #.
-                            i = 1
-                            operand = operand[1:]
-                        else:
-                            # neither indirect nor immediate. n=1 i=1.
-                            n = 1
-                            i = 1
-                    else:
-                        # no operand.
-                        n = 1
-                        i = 1
-
-                    """
-                    test operand correct and type.
-                    type: symbol, immediate address mode which contain integer #integer, literal =X or =C.
-                    """
-                    address = 0
-                    is_address = True
-
-                    if operand in self.__symbol_tab.keys():
-                        # address = symbol address + block address.
-                        address = self.__real_address(self.__symbol_tab[operand][0], self.__symbol_tab[operand][1])
-                    elif operand in self.__extref:
-                        address = 0
-                    elif i == 1 and n == 0:
-                        # immediate address mode operand can contain integer
-                        try:
-                            is_address = False
-                            address = int(operand)
-                        except ValueError:
-                            print(self.row(index) + '   ' + '#' + operand + ' is error operand.')
-                    elif operand == '':
-                        # no operand
-                        is_address = False
-                    elif operand[0] == '=':
-                        # address = literal address + literal's block address.
-                        key = A.xc_to_ascii(operand[1:])
-                        address = self.__real_address(self.__literal_tab[key][2], self.__literal_tab[key][3])
-                    else:
-                        print(self.row(index) + '   ' + operand + ' is undefined symbol.')
-
-                    if e == 0:
-                        """"
-                        format three.
-                        first step check PC relative, if can not, check BASE relative, if can not, output error.
-                        """
-                        if is_address:
-                            if -2048 <= address - self.__code[index][5] <= 2047:
-                                # PC relative, -2048 <= displacement <= 2047. code[i][5] is program counter.
-                                p = 1
-                                address = address - self.__code[index][5]
-                            elif 0 <= address - self.__base <= 4095:
-                                # BASE relative, 0 <= displacement <= 4095.
-                                b = 1
-                                address = address - self.__base
-                            elif not(i == 1 and n == 0):
-                                print(self.row(index) + ' can not use format three.')
-
-                        """
-                        generate format 3 object code
-                        first item: opcode|n|i  opcode 6 bits and n, i each 1 bit convert to 2 columns hexadecimal.
-                        second item: x|b|p|e  x, b, p, e each 1 bit convert to 1 column hexadecimal.
-                        third item: displacement 12 bit convert to 3 column hexadecimal.
-                        """
-                        self.__code[index][6] = A.output_hex((int(self.__operator_tab[operator][0], 16) + n * 2 + i * 1), 2) + \
-                                                A.output_hex(x * 8 + b * 4 + p * 2 + e * 1, 1) + \
-                                                A.output_hex(address, 3)
-                    else:
-                        """
-                        format four.
-                        generate format 4 object code
-                        first item: opcode|n|i  opcode 6 bits and n, i each 1 bit convert to 2 columns hexadecimal.
-                        second item: x|b|p|e  x, b, p, e each 1 bit convert to 1 column hexadecimal.
-                        third item: address 20 bit convert to 5 column hexadecimal.
-                        """
-                        if not (i == 1 and n == 0) and is_address:
-                            # immediate address mode relocation.
-                            m = 'M' + A.output_hex(self.__code[index][0] - self.__code[start][0] + 1, 6) + A.output_hex(5, 2)
-                            # if operand is external reference then modify + operand.
-                            m += ('+' + operand) if operand in self.__extref else ''
-                            self.__modify.append(m)
-
-                        self.__code[index][6] = A.output_hex(int(self.__operator_tab[operator][0], 16) + n * 2 + i * 1, 2) + \
-                                                A.output_hex(x * 8 + b * 4 + p * 2 + e * 1, 1) + \
-                                                A.output_hex(address, 5)
-            elif operator == 'BYTE':
-                # object code: operand perform ascii code. ex: BYTE C'EOF' -> 454f46
-                self.__code[index][6] = A.xc_to_ascii(operand)
-            elif operator == 'WORD':
-                # object code: convert decimal integer into 6 columns hexadecimal.
-                number, plus, minus, error = A.expression(self.__modify, self.__symbol_tab, self.__extref, operand,
-                                                          self.__code[index][0] - self.__code[start][0])
-                if not error:
-                    self.__code[index][6] = A.output_hex(number, 6)
-            elif operator == 'BASE':
-                # reset Base register.
-                if operand == '*':
-                    self.__base = self.__code[index][5]
-                elif operand in self.__symbol_tab.keys():
-                    self.__base = self.__real_address(self.__symbol_tab[operand][0], self.__symbol_tab[operand][1])
-                else:
-                    print(self.row(index) + '   ' + operand + ' is undefined symbol.')
-            elif operator == 'NOBASE':
-                self.__base = 0
+        self._pass2_rows(index)
+        self._count()
+
+    def _instruction2(self, index, line):
+        entry = line.entry
+        if entry.format == Optab.Format.ONE:
+            # format 1
+            # object code: opcode 8 bit.
+            line.object_code = bytes((entry.opcode,))
+            return
+        elif entry.format == Optab.Format.TWO:
+            # format 2 register, invalid register is 0.
+            if line.value is None:
+                self._diagnostics.error(index, D.INVALID_OPERAND, line.operand)
+            else:
+                for register in line.target:
+                    self._diagnostics.error(index, D.INVALID_REGISTER, register)
+                # object code: opcode 8 bit + register1 4 bit + register2 4 bit.
+                line.object_code = bytes((entry.opcode, line.value))
+            return
+
+        # format 3 or format 4, mode is n * 2 + i.
+        symbol_tab = self._symbol_tab
+        mode = line.mode
+        e = line.extend
+        operand = line.target
+        b, p = 0, 0
 
-            index += 1
+        """
+        test operand correct and type.
+        type: symbol, immediate address mode which contain integer #integer, literal =X or =C.
+        """
+        address = 0
+        is_address = True
+
+        if self._profile is not None:
+            self._lookups += 1
+        if line.kind == Source.INTEGER:
+            # immediate address mode operand can contain integer
+            is_address = False
+            address = line.value
+        elif line.kind == Source.NO_OPERAND:
+            # no operand
+            is_address = False
+        elif symbol_tab.defined[line.value]:
+            # symbol or literal id, address = address + block address.
+            address = symbol_tab.address[line.value] + self.__block_tab[symbol_tab.block[line.value] + 1]
+        elif operand in self.__extref:
+            address = 0
+        elif mode == Source.IMMEDIATE:
+            is_address = False
+            self._diagnostics.error(index, D.INVALID_IMMEDIATE, operand)
+        else:
+            self._diagnostics.error(index, D.UNDEFINED_SYMBOL, operand)
+
+        if e == 0:
+            """"
+            format three.
+            first step check PC relative, if can not, check BASE relative, if can not, output error.
+            """
+            if is_address:
+                # program counter is block relative, address is real.
+                pc = line.pc + self.__block_tab[line.block + 1]
+                if -2048 <= address - pc <= 2047:
+                    # PC relative, -2048 <= displacement <= 2047. pc is program counter.
+                    p = 1
+                    address = address - pc
+                elif 0 <= address - self.__base <= 4095:
+                    # BASE relative, 0 <= displacement <= 4095.
+                    b = 1
+                    address = address - self.__base
+                elif mode != Source.IMMEDIATE:
+                    self._diagnostics.error(index, D.FORMAT_THREE)
+        elif mode != Source.IMMEDIATE and is_address:
+            """
+            format four.
+            immediate address mode relocation.
+            if operand is external reference then modify + operand.
+            """
+            if operand in self.__extref:
+                self.__modify.append((self._address(line) - self._start_address + 1, 5, '+', operand))
+            else:
+                self.__modify.append((self._address(line) - self._start_address + 1, 5, '', ''))
+
+        """
+        generate format 3(3 bytes) or format 4(4 bytes) object code.
+        first item: opcode|n|i  opcode 6 bits and n, i each 1 bit.
+        second item: x|b|p|e  x, b, p, e each 1 bit.
+        third item: displacement 12 bit or address 20 bit.
+        """
+        line.object_code = A.instruction(entry.opcode + mode, line.index * 8 + b * 4 + p * 2 + e, address, e)
+
+    def __word(self, index, line):
+        # object code: 3 bytes integer.
+        value = self.__expression(index, line.operand)
+        # external reference in WORD need modify record at this word.
+        self.__modify.extend(A.modification(value.external, self._address(line) - self._start_address))
+        if not value.error:
+            line.object_code = A.encode(value.value, 3)
+
+    def __base_row(self, index, line):
+        # reset Base register.
+        operand = line.operand
+        if self._profile is not None:
+            self._lookups += 1
+        if operand == '*':
+            self.__base = line.pc + self.__block_tab[line.value + 1]
+        elif operand in self._symbol_tab:
+            self.__base = self.__real_address(*self._symbol_tab[operand])
+        else:
+            self._diagnostics.error(index, D.UNDEFINED_SYMBOL, operand)
+
+    def __nobase(self, index, line):
+        self.__base = 0
+
+
+def assemble_section(rows, op_file, main, profile=None, coalesce=False, relocation_bits=False, listing=False):
+    """
+    assemble one control section in worker process.
+    :param rows: [(symbol, operator, operand, value)] of this control section, end with END or CSECT row.
+                 value is EQU value resolved by include file cache or None.
+    :param op_file: operator file(.csv)
+    :param main: whether this control section is main program.
+    :param profile: empty Profile.Profile to count into, None for disabled.
+    :param coalesce: whether T records are packed by final address.
+    :param relocation_bits: whether relocation M records are written as relocation bit masks.
+    :param listing: whether rows carry every row for figure.
+    :return: Record.Section, [Diagnostic], rows, counters of profile or None.
+    """
+    code = []
+    for symbol, operator, operand, value in rows:
+        line = Source.Line(symbol, operator, operand)
+        line.value = value
+        code.append(line)
+    section, records, rows = SicXE().assemble(code, op_file, main, profile, coalesce, relocation_bits, listing)
+    return section, records, rows, None if profile is None else profile.counters
@@ -0,0 +1,165 @@
+import mmap
+import sys
+import Arithmetic as A
+import Optab
+
+# register numbering of format 2.
+REGISTER = {'A': 0, 'X': 1, 'L': 2, 'PC': 8, 'SW': 9, 'B': 3, 'S': 4, 'T': 5, 'F': 6}
+
+# addressing mode of lexed row: n * 2 + i.
+SIMPLE = 3
+INDIRECT = 2
+IMMEDIATE = 1
+
+# operand kind of lexed row.
+NO_OPERAND = 0
+SYMBOL = 1
+LITERAL = 2
+INTEGER = 3
+
+
+class Line(object):
+    """
+    a row of assembly code, shared by Sic and SicXE.
+    __slots__ keeps each row as small as a tuple and attribute access replaces magic index.
+    typed fields are filled by lex, pass1 and pass2 read them instead of parsing operator and operand again.
+    """
+    __slots__ = ('loc', 'block', 'symbol', 'operator', 'operand', 'pc', 'object_code',
+                 'entry', 'extend', 'mode', 'index', 'kind', 'target', 'value', 'data')
+
+    def __init__(self, symbol='', operator='', operand='', loc='', block='', pc=0, object_code=b''):
+        """
+        :param symbol: symbol(label).
+        :param operator: operator or directive.
+        :param operand: operand.
+        :param loc: location, '' for row without location.
+        :param block: block number, '' for row without block.
+        :param pc: program counter.
+        :param object_code: object code(bytes), hexadecimal only when it is written.
+        """
+        self.loc = loc
+        self.block = block
+        self.symbol = symbol
+        self.operator = operator
+        self.operand = operand
+        self.pc = pc
+        self.object_code = object_code
+        # typed fields, see lex.
+        self.entry = None
+        self.extend = 0
+        self.mode = SIMPLE
+        self.index = 0
+        self.kind = NO_OPERAND
+        self.target = ''
+        self.value = None
+        self.data = b''
+
+
+def lex(line, operator_tab, xe=True):
+    """
+    parse operator and operand of a row once into typed fields.
+    entry: Optab.Operator of instruction, None for directive.
+    extend: 1 for format 4(+operator).
+    mode: SIMPLE, INDIRECT(@) or IMMEDIATE(#).
+    index: 1 for index address(,X).
+    kind: NO_OPERAND, SYMBOL, LITERAL(=) or INTEGER(immediate integer).
+    target: operand without @, #, ,X, ex: '+LDA @BUF,X' -> target 'BUF'. format 2: invalid register names.
+    value: immediate integer. format 2: register1(4 bits)|register2(4 bits), None for too many registers.
+    data: literal or BYTE object code.
+    :param line: Line.
+    :param operator_tab: {operator: Operator(opcode, format)}
+    :param xe: False for SIC, which has no format 4, @, #, literal and format 2.
+    :return: line.
+    """
+    operator = line.operator
+    operand = line.operand
+    if xe and operator[:1] == '+':
+        line.extend = 1
+        operator = operator[1:]
+
+    entry = operator_tab.get(operator)
+    line.entry = entry
+    if entry is None:
+        if operator == 'BYTE':
+            line.data = A.xc_to_bytes(operand)
+        return line
+
+    if entry.format == Optab.Format.TWO and xe:
+        # register list, invalid register is 0.
+        names = operand.split(',')
+        line.target = tuple(name for name in names if name not in REGISTER)
+        if len(names) <= 2:
+            line.value = REGISTER.get(names[0], 0) << 4 | (REGISTER.get(names[1], 0) if len(names) == 2 else 0)
+        return line
+
+    if operand[-2:] == ',X':
+        line.index = 1
+        operand = operand[:-2]
+
+    if xe:
+        if operand[:1] == '@':
+            line.mode = INDIRECT
+            operand = operand[1:]
+        elif operand[:1] == '#':
+            line.mode = IMMEDIATE
+            operand = operand[1:]
+
+    line.target = operand
+    if operand == '':
+        line.kind = NO_OPERAND
+    elif xe and operand[0] == '=':
+        line.kind = LITERAL
+        line.data = A.xc_to_bytes(operand[1:])
+    else:
+        line.kind = SYMBOL
+        if line.mode == IMMEDIATE:
+            try:
+                line.value = int(operand)
+                line.kind = INTEGER
+            except ValueError:
+                # symbol, or invalid immediate reported by pass2.
+                pass
+    return line
+
+
+def read_lines(file_name, use_mmap=False):
+    """
+    read assembly code file line by line lazily, whole file is never held in memory.
+    :param file_name: assembly code file(.txt).
+    :param use_mmap: whether read file through mmap.
+    :return: generator of line(string) without line break.
+    """
+    if not use_mmap:
+        with open(file_name, 'r') as file:
+            for line in file:
+                yield line.rstrip('\n')
+        return
+
+    with open(file_name, 'rb') as file:
+        try:
+            content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file can not be mapped.
+            return
+
+        with content:
+            for line in iter(content.readline, b''):
+                yield line.decode().rstrip('\r\n')
+
+
+def read_code(file_name, use_mmap=False):
+    """
+    tokenize assembly code lazily.
+    ex: 'FIRST\tSTL\tRETADR' -> Line(symbol='FIRST', operator='STL', operand='RETADR')
+    symbol, operator and operand are interned, repeated names share one string.
+    :param file_name: assembly code file(.txt).
+    :param use_mmap: whether read file through mmap.
+    :return: generator of Line.
+    """
+    intern = sys.intern
+    for line in read_lines(file_name, use_mmap):
+        # cut by tab, missing column is ''.
+        row = line.split('\t')
+        if len(row) < 3:
+            row += [''] * (3 - len(row))
+        yield Line(intern(row[0]), intern(row[1]), intern(row[2]))
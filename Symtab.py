@@ -0,0 +1,80 @@
+from array import array
+
+
+class SymbolTable(object):
+    """
+    symbol table of dense integer id.
+    a name(symbol string, or literal object code bytes) gets an id when it is defined or referred first,
+    address, block and whether defined of every id are kept in array columns.
+    pass1 resolves names of rows into id once, pass2 reads columns by id.
+    names: [name], index is id.
+    address: array of address or absolute value.
+    block: array of block number, -1 for absolute term.
+    defined: bytearray, 1 for defined id, 0 for referred but not defined yet.
+    """
+    def __init__(self):
+        self.__ids = {}
+        self.names = []
+        self.address = array('q')
+        self.block = array('i')
+        self.defined = bytearray()
+
+    def ref(self, name):
+        """
+        id of a name, a new undefined id is given to name which is not in table.
+        :param name: symbol or literal object code.
+        :return: id.
+        """
+        index = self.__ids.get(name)
+        if index is None:
+            index = self.__ids[name] = len(self.names)
+            self.names.append(name)
+            self.address.append(0)
+            self.block.append(0)
+            self.defined.append(0)
+        return index
+
+    def define(self, name, address, block=0):
+        """
+        define or redefine a name.
+        :param name: symbol or literal object code.
+        :param address: address or absolute value.
+        :param block: block number, -1 for absolute term.
+        :return: id.
+        """
+        index = self.ref(name)
+        self.address[index] = address
+        self.block[index] = block
+        self.defined[index] = 1
+        return index
+
+    def clear(self):
+        """
+        remove every name, ex: next control section.
+        """
+        self.__ids.clear()
+        del self.names[:]
+        del self.address[:]
+        del self.block[:]
+        del self.defined[:]
+
+    def __contains__(self, name):
+        """
+        :param name: symbol or literal object code.
+        :return: whether name is defined.
+        """
+        index = self.__ids.get(name)
+        return index is not None and self.defined[index] == 1
+
+    def __getitem__(self, name):
+        """
+        :param name: defined symbol or literal object code.
+        :return: (address, block), the same shape as [address, block] of dict symbol table.
+        """
+        index = self.__ids.get(name)
+        if index is None or self.defined[index] == 0:
+            raise KeyError(name)
+        return self.address[index], self.block[index]
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,68 @@
+import io
+import os
+import pytest
+import Binary
+import Loader
+import Record
+from SIC import Sic
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+FIGURES = ['2.1', '2.5', '2.9', '2.11', '2.15']
+
+
+def golden(figure):
+    return os.path.join(path, 'object_code', 'object_code' + figure + '.txt')
+
+
+@pytest.mark.parametrize('figure', FIGURES)
+def test_text_binary_text_is_lossless(figure, tmp_path):
+    binary_file = str(tmp_path / 'object.bin')
+    text_file = str(tmp_path / 'object.txt')
+    Binary.text_to_binary(golden(figure), binary_file)
+    Binary.binary_to_text(binary_file, text_file)
+    with open(text_file) as got, open(golden(figure)) as expect:
+        assert got.read() == expect.read()
+
+
+@pytest.mark.parametrize('figure, assembler', [('2.1', Sic), ('2.5', SicXE), ('2.15', SicXE)])
+def test_binary_writer_matches_text_writer(figure, assembler, tmp_path):
+    binary_file = str(tmp_path / 'object.bin')
+    code_file = os.path.join(path, 'assembly', 'Figure' + figure + '.txt')
+    assembler().run(code_file, op_file, binary_file, binary=True)
+    assert Loader.read(binary_file)[0].name == Loader.read(golden(figure))[0].name
+
+    dialect, sections = Binary.load(binary_file)
+    out = io.StringIO()
+    with Record.ObjectWriter(out, dialect) as writer:
+        for section in sections:
+            writer.write(section)
+    with open(golden(figure)) as expect:
+        assert out.getvalue() == expect.read()
+
+
+def test_relocation_bit_flag_is_kept_per_section(tmp_path):
+    code_file = tmp_path / 'code.txt'
+    # only main program has relocated format 4 code.
+    code_file.write_text('PROG\tSTART\t1000\nFIRST\t+JSUB\tFIRST\n\tRSUB\n'
+                         'SUB\tCSECT\n\tLDA\t#3\n\tRSUB\n\tEND\tFIRST\n')
+    text_file = str(tmp_path / 'object.txt')
+    SicXE().run(str(code_file), op_file, text_file, relocation_bits=True)
+    with open(text_file) as file:
+        text = file.read()
+    sections = Record.parse(text)[1]
+    assert [section.masks is not None for section in sections] == [True, False]
+
+    binary_file = str(tmp_path / 'object.bin')
+    round_trip = str(tmp_path / 'round_trip.txt')
+    Binary.text_to_binary(text_file, binary_file)
+    Binary.binary_to_text(binary_file, round_trip)
+    with open(round_trip) as file:
+        assert file.read() == text
+
+
+def test_loads_rejects_other_files():
+    with pytest.raises(ValueError):
+        Binary.loads(b'H^COPY  ^000000^001077\n' + bytes(16))
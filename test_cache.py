@@ -0,0 +1,78 @@
+import io
+import os
+import Cache
+import Main
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+SOURCE = 'PROG\tSTART\t0\n\tINCLUDE\tdefs.txt\n\tDEFS\nFIRST\tLDA\t#SIZE\n\tLDX\t#COUNT\n\tRSUB\n\tEND\tFIRST\n'
+# include row of macro body is only found by expansion.
+LIBRARY = 'DEFS\tMACRO\n\tINCLUDE\tcount.txt\n\tMEND\n'
+
+
+def write(tmp_path, size=3, count=4):
+    (tmp_path / 'code.txt').write_text(SOURCE)
+    (tmp_path / 'library.txt').write_text(LIBRARY)
+    (tmp_path / 'defs.txt').write_text('SIZE\tEQU\t' + str(size) + '\n')
+    (tmp_path / 'count.txt').write_text('COUNT\tEQU\t' + str(count) + '\n')
+
+
+def run(tmp_path, capsys):
+    """
+    assemble code.txt through Main with build cache.
+    :return: (machine column, object code)
+    """
+    status = Main.main([str(tmp_path / 'code.txt'), '-j', '1', '--no-figure', '--optab', op_file,
+                        '--cache', str(tmp_path / 'cache'), '--macro-lib', str(tmp_path / 'library.txt')])
+    assert status == 0
+    row = capsys.readouterr().out.split('\n')[1]
+    return row.split()[1], (tmp_path / 'code.obj.txt').read_text()
+
+
+def test_unchanged_file_is_replayed(tmp_path, capsys):
+    write(tmp_path)
+    machine, object_text = run(tmp_path, capsys)
+    assert machine == 'SICXE'
+    assert run(tmp_path, capsys) == ('SICXE*', object_text)
+
+
+def test_changed_include_file_is_assembled_again(tmp_path, capsys):
+    write(tmp_path)
+    _, object_text = run(tmp_path, capsys)
+    write(tmp_path, size=5)
+    machine, changed = run(tmp_path, capsys)
+    assert machine == 'SICXE'
+    assert changed != object_text
+    assert run(tmp_path, capsys) == ('SICXE*', changed)
+
+
+def test_changed_include_file_of_macro_library_is_assembled_again(tmp_path, capsys):
+    write(tmp_path)
+    _, object_text = run(tmp_path, capsys)
+    write(tmp_path, count=9)
+    machine, changed = run(tmp_path, capsys)
+    assert machine == 'SICXE'
+    assert changed != object_text
+
+
+def test_changed_macro_library_is_assembled_again(tmp_path, capsys):
+    write(tmp_path)
+    run(tmp_path, capsys)
+    with open(tmp_path / 'library.txt', 'a') as file:
+        file.write('UNUSED\tMACRO\n\tRSUB\n\tMEND\n')
+    assert run(tmp_path, capsys)[0] == 'SICXE'
+
+
+def test_section_cache_follows_include_files(tmp_path):
+    write(tmp_path)
+    cache = Cache.BuildCache(str(tmp_path / 'cache'))
+    outputs = []
+    for size in (3, 5, 3):
+        write(tmp_path, size=size)
+        out = io.StringIO()
+        SicXE().run(str(tmp_path / 'code.txt'), op_file, out, cache=cache, libraries=[str(tmp_path / 'library.txt')])
+        outputs.append(out.getvalue())
+    assert outputs[0] != outputs[1]
+    assert outputs[0] == outputs[2]
@@ -0,0 +1,60 @@
+import io
+import os
+import pytest
+import Cache
+import Loader
+import Record
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+FIGURES = ['2.5', '2.9', '2.11', '2.15']
+
+
+def code_file(figure):
+    return os.path.join(path, 'assembly', 'Figure' + figure + '.txt')
+
+
+def golden(figure):
+    return Loader.read(os.path.join(path, 'object_code', 'object_code' + figure + '.txt'))
+
+
+def coalesced(figure, **kw):
+    out = io.StringIO()
+    SicXE().run(code_file(figure), op_file, out, coalesce=True, **kw)
+    return Record.parse(out.getvalue())[1]
+
+
+@pytest.mark.parametrize('figure', FIGURES)
+def test_coalesced_program_loads_like_golden(figure):
+    sections = coalesced(figure)
+    expect = golden(figure)
+    assert [section.modify for section in sections] == [section.modify for section in expect]
+    for address in (None, 0x4000):
+        image = Loader.link(sections, address)
+        golden_image = Loader.link(expect, address)
+        assert image.memory == golden_image.memory
+        assert image.entry == golden_image.entry
+        assert image.estab == golden_image.estab
+
+
+@pytest.mark.parametrize('figure', FIGURES)
+def test_coalesced_t_records_are_maximal(figure):
+    for section in coalesced(figure):
+        for (address, length, _), (next_address, _, codes) in zip(section.text, section.text[1:]):
+            # a record ends at a gap, or the next object code does not fit.
+            assert address + length != next_address or length + len(codes[0]) > Record.TLENGTH
+
+
+def test_use_blocks_do_not_fragment_t_records():
+    assert len(golden('2.11')[0].text) == 7
+    assert len(coalesced('2.11')[0].text) == 5
+
+
+def test_workers_and_cache_write_the_same_records(tmp_path):
+    expect = [section.text for section in coalesced('2.15')]
+    assert [section.text for section in coalesced('2.15', workers=2)] == expect
+    cache = Cache.BuildCache(str(tmp_path))
+    for _ in range(2):
+        assert [section.text for section in coalesced('2.15', cache=cache)] == expect
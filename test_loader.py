@@ -0,0 +1,70 @@
+import io
+import os
+import Loader
+import Record
+from SIC import Sic
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+# format 4 instructions get relocation M records, USE blocks move rows after START.
+XE_CODE = '\n'.join(['PROG\tSTART\t{}',
+                     'FIRST\tLDB\t#TABLE',
+                     '\tBASE\tTABLE',
+                     '\tUSE\tDATA',
+                     'TABLE\tWORD\t7',
+                     'PTR\tRESW\t1',
+                     '\tUSE',
+                     '\t+JSUB\tSUB',
+                     '\tLDA\tTABLE',
+                     '\tJ\tFIRST',
+                     '\tUSE\tCODE2',
+                     'SUB\tLDA\tPTR',
+                     '\t+STA\tTABLE',
+                     'LAST\tRSUB',
+                     '\tEND\tFIRST', ''])
+
+SIC_CODE = '\n'.join(['PROG\tSTART\t{}',
+                      'FIRST\tJSUB\tSUB',
+                      '\tLDA\tDATA',
+                      '\tJ\tFIRST',
+                      'SUB\tSTA\tDATA,X',
+                      '\tRSUB',
+                      'DATA\tWORD\t5',
+                      '\tEND\tFIRST', ''])
+
+
+def assemble(tmp_path, assembler, code, start, **kw):
+    code_file = tmp_path / ('code' + start + '.txt')
+    code_file.write_text(code.format(start))
+    out = io.StringIO()
+    assembler().run(str(code_file), op_file, out, **kw)
+    return Record.parse(out.getvalue())[1]
+
+
+def test_m_records_relocate_program_with_nonzero_start(tmp_path):
+    moved = Loader.link(assemble(tmp_path, SicXE, XE_CODE, '1000'), 0x4000)
+    expect = Loader.link(assemble(tmp_path, SicXE, XE_CODE, '4000'))
+    assert moved.errors == []
+    assert moved.address == expect.address == 0x4000
+    assert moved.memory == expect.memory
+    assert moved.entry == expect.entry
+
+
+def test_relocation_bits_relocate_like_m_records(tmp_path):
+    for assembler, code in [(SicXE, XE_CODE), (Sic, SIC_CODE)]:
+        moved = Loader.link(assemble(tmp_path, assembler, code, '1000', relocation_bits=True), 0x4000)
+        expect = Loader.link(assemble(tmp_path, assembler, code, '4000'))
+        assert moved.memory == expect.memory
+
+
+def test_external_references_are_linked():
+    sections = Loader.read(os.path.join(path, 'object_code', 'object_code2.15.txt'))
+    image = Loader.link(sections, 0x4000)
+    assert image.errors == []
+    assert image.estab['COPY'] == 0x4000
+    assert image.estab['RDREC'] == 0x4000 + sections[0].length
+    # +JSUB RDREC of first section: 4B1 then 20 bits address.
+    at = sections[0].text[0][0] + 3
+    assert int.from_bytes(image.memory[at:at + 4], 'big') & 0xFFFFF == image.estab['RDREC']
@@ -0,0 +1,82 @@
+import io
+import os
+import Diagnostics as D
+import Macro
+import Source
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+# $ label is unique per expansion, keyword parameter has a default, IF is evaluated at expansion.
+DEFINITION = ['CLEARN\tMACRO\t&ADDR,&N,&REG=A',
+              '\tLDX\t#0',
+              '$LOOP\tSTCH\t&ADDR,X',
+              '\tTIX\t#&N',
+              '\tJLT\t$LOOP',
+              '\tIF\t(&REG EQ S)',
+              '\tCLEAR\tS',
+              '\tENDIF',
+              '\tMEND']
+
+MACRO_CODE = ['PROG\tSTART\t0',
+              'FIRST\tCLEARN\tBUF,3',
+              '\tCLEARN\tBUF,6,REG=S',
+              '\tRSUB',
+              'BUF\tRESB\t6',
+              '\tEND\tFIRST']
+
+EXPANDED_CODE = ['PROG\tSTART\t0',
+                 'FIRST\tLDX\t#0',
+                 'L1\tSTCH\tBUF,X',
+                 '\tTIX\t#3',
+                 '\tJLT\tL1',
+                 '\tLDX\t#0',
+                 'L2\tSTCH\tBUF,X',
+                 '\tTIX\t#6',
+                 '\tJLT\tL2',
+                 '\tCLEAR\tS',
+                 '\tRSUB',
+                 'BUF\tRESB\t6',
+                 '\tEND\tFIRST']
+
+
+def assemble(tmp_path, rows, libraries=()):
+    code_file = tmp_path / 'code.txt'
+    code_file.write_text('\n'.join(rows) + '\n')
+    out = io.StringIO()
+    diagnostics = D.Diagnostics()
+    SicXE().run(str(code_file), op_file, out, diagnostics=diagnostics, libraries=libraries)
+    return out.getvalue(), diagnostics
+
+
+def test_expansion_assembles_like_hand_expanded_code(tmp_path):
+    expanded, diagnostics = assemble(tmp_path, MACRO_CODE[:1] + DEFINITION + MACRO_CODE[1:])
+    assert diagnostics.count == 0
+    assert expanded == assemble(tmp_path, EXPANDED_CODE)[0]
+
+
+def test_library_macro_assembles_like_inline_macro(tmp_path):
+    library = tmp_path / 'library.txt'
+    library.write_text('\n'.join(DEFINITION) + '\n')
+    expanded, diagnostics = assemble(tmp_path, MACRO_CODE, [str(library)])
+    assert diagnostics.count == 0
+    assert expanded == assemble(tmp_path, EXPANDED_CODE)[0]
+
+
+def test_label_of_invocation_is_kept_and_rows_are_annotated():
+    rows = [Source.Line(*row.split('\t')) for row in DEFINITION + MACRO_CODE[1:2]]
+    lines = list(Macro.MacroProcessor().expand(rows))
+    # definition and invocation rows become annotation rows, so row indices of source are kept.
+    assert all(line.symbol == '.' for line in lines[:len(DEFINITION) + 1])
+    expanded = lines[len(DEFINITION) + 1:]
+    assert [line.operator for line in expanded] == ['LDX', 'STCH', 'TIX', 'JLT']
+    assert expanded[0].symbol == 'FIRST'
+    assert expanded[1].symbol.startswith('$') and expanded[3].operand == expanded[1].symbol
+
+
+def test_definition_without_mend_is_reported():
+    diagnostics = D.Diagnostics()
+    rows = [Source.Line(*row.split('\t')) for row in DEFINITION[:-1]]
+    list(Macro.MacroProcessor(diagnostics=diagnostics).expand(rows))
+    assert [record.code for record in diagnostics.records] == [D.MACRO_DEFINITION]
@@ -0,0 +1,47 @@
+import io
+import os
+import pytest
+import Diagnostics as D
+import Generator
+import Loader
+import Record
+from OnePass import OnePass
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+
+def images(code_file):
+    """
+    :return: (two pass Loader.Image, one pass Loader.Image, one pass Diagnostics.Diagnostics)
+    """
+    two, one = io.StringIO(), io.StringIO()
+    diagnostics = D.Diagnostics()
+    SicXE().run(code_file, op_file, two, diagnostics=D.Diagnostics())
+    OnePass().run(code_file, op_file, one, diagnostics=diagnostics)
+    return (Loader.link(Record.parse(two.getvalue())[1]), Loader.link(Record.parse(one.getvalue())[1]),
+            diagnostics)
+
+
+@pytest.mark.parametrize('figure', ['2.5', '2.9', '2.15'])
+def test_one_pass_loads_like_two_pass(figure):
+    two, one, diagnostics = images(os.path.join(path, 'assembly', 'Figure' + figure + '.txt'))
+    assert diagnostics.count == 0
+    assert one.memory == two.memory
+    assert one.entry == two.entry
+    assert one.estab == two.estab
+
+
+def test_forward_references_across_written_t_records(tmp_path):
+    code_file = str(tmp_path / 'generated.txt')
+    Generator.write(code_file, lines=2000, csects=2, seed=3)
+    two, one, diagnostics = images(code_file)
+    assert diagnostics.count == 0
+    assert one.memory == two.memory
+
+
+def test_use_block_is_reported():
+    diagnostics = D.Diagnostics()
+    OnePass().run(os.path.join(path, 'assembly', 'Figure2.11.txt'), op_file, io.StringIO(), diagnostics=diagnostics)
+    assert D.UNSUPPORTED in [record.code for record in diagnostics.records]
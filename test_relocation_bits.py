@@ -0,0 +1,63 @@
+import io
+import os
+import pytest
+import Loader
+import Record
+from SIC import Sic
+from SICXE import SicXE
+
+path = os.path.dirname(os.path.abspath(__file__))
+op_file = os.path.join(path, 'opcode.csv')
+
+
+def code_file(figure):
+    return os.path.join(path, 'assembly', 'Figure' + figure + '.txt')
+
+
+def golden(figure):
+    return Loader.read(os.path.join(path, 'object_code', 'object_code' + figure + '.txt'))
+
+
+def assemble(figure, assembler=SicXE, **kw):
+    out = io.StringIO()
+    assembler().run(code_file(figure), op_file, out, relocation_bits=True, **kw)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('figure', ['2.5', '2.9', '2.11', '2.15'])
+def test_relocation_bits_load_like_golden(figure):
+    sections = Record.parse(assemble(figure))[1]
+    expect = golden(figure)
+    for address in (None, 0x4000):
+        image = Loader.link(sections, address)
+        golden_image = Loader.link(expect, address)
+        assert image.memory == golden_image.memory
+        assert image.entry == golden_image.entry
+        assert image.errors == []
+
+
+def test_relocation_m_records_become_masks():
+    text = assemble('2.5')
+    assert text.startswith('H^COPY  ^000000^001077^R\n')
+    section = Record.parse(text)[1][0]
+    # every relocation M record of golden is a bit of a mask.
+    assert section.modify == []
+    assert sum(bin(mask).count('1') for mask in section.masks) == len(golden('2.5')[0].modify)
+
+
+def test_sic_program_is_relocatable():
+    sections = Record.parse(assemble('2.1', Sic))[1]
+    assert sections[0].masks is not None
+    image = Loader.link(sections, 0x4000)
+    golden_image = Loader.link(golden('2.1'))
+    # address field of JSUB RDREC at 1003 moves by load offset.
+    at = 0x1003 - golden_image.address
+    offset = 0x4000 - golden_image.address
+    assert int.from_bytes(image.memory[at + 1:at + 3], 'big') == \
+        int.from_bytes(golden_image.memory[at + 1:at + 3], 'big') + offset
+    assert len(image.memory) == len(golden_image.memory)
+
+
+def test_external_m_records_are_compacted():
+    modify = [(7, 6, '+', 'B'), (1, 5, '+', 'A'), (7, 6, '-', 'B'), (1, 5, '+', 'A')]
+    assert Record.compact(modify) == [(1, 5, '+', 'A'), (1, 5, '+', 'A')]